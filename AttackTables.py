@@ -0,0 +1,230 @@
+from __future__ import annotations
+from typing import List
+
+WHITE = 0
+BLACK = 1
+
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_B = FILE_A << 1
+FILE_G = FILE_A << 6
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_2 = RANK_1 << 8
+RANK_3 = RANK_1 << 16
+RANK_6 = RANK_1 << 40
+RANK_7 = RANK_1 << 48
+RANK_8 = RANK_1 << 56
+
+KNIGHT_OFFSETS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+KING_OFFSETS = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+
+def squares_of(bitboard: int) -> List[int]:
+    """
+        Returns: The index of every set bit, lowest first
+    """
+    squares = []
+    while bitboard:
+        lowest = bitboard & -bitboard
+        squares.append(lowest.bit_length() - 1)
+        bitboard ^= lowest
+    return squares
+
+def _leaper_squares(square: int, offsets: List[tuple[int, int]]) -> List[tuple[int, int]]:
+    file = square & 7
+    rank = square >> 3
+    squares = []
+    for file_offset, rank_offset in offsets:
+        if 0 <= file + file_offset < 8 and 0 <= rank + rank_offset < 8:
+            squares.append((file + file_offset, rank + rank_offset))
+    return squares
+
+def _mask(squares: List[tuple[int, int]]) -> int:
+    mask = 0
+    for file, rank in squares:
+        mask |= 1 << (rank * 8 + file)
+    return mask
+
+# (file, rank) pairs reachable from each square index (rank * 8 + file), for the 8x8 board of Piece objects
+KNIGHT_SQUARES: List[List[tuple[int, int]]] = [_leaper_squares(square, KNIGHT_OFFSETS) for square in range(64)]
+KING_SQUARES: List[List[tuple[int, int]]] = [_leaper_squares(square, KING_OFFSETS) for square in range(64)]
+# Indexed [color][square], pawns on the last rank attack nothing
+PAWN_SQUARES: List[List[List[tuple[int, int]]]] = [
+    [_leaper_squares(square, [(-1, 1), (1, 1)]) if square < 56 else [] for square in range(64)],
+    [_leaper_squares(square, [(-1, -1), (1, -1)]) if square >= 8 else [] for square in range(64)],
+]
+
+# The same tables as bitboards
+KNIGHT_ATTACKS: List[int] = [_mask(squares) for squares in KNIGHT_SQUARES]
+KING_ATTACKS: List[int] = [_mask(squares) for squares in KING_SQUARES]
+PAWN_ATTACKS: List[List[int]] = [[_mask(squares) for squares in PAWN_SQUARES[color]] for color in (WHITE, BLACK)]
+
+ROOK_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+def slider_attacks(square: int, occupancy: int, directions: List[tuple[int, int]]) -> int:
+    """
+        Walks each ray one square at a time, only used to fill the magic tables
+    """
+    attacks = 0
+    file = square & 7
+    rank = square >> 3
+    for file_direction, rank_direction in directions:
+        new_file = file + file_direction
+        new_rank = rank + rank_direction
+        while 0 <= new_file < 8 and 0 <= new_rank < 8:
+            bit = 1 << (new_rank * 8 + new_file)
+            attacks |= bit
+            if occupancy & bit:
+                break
+            new_file += file_direction
+            new_rank += rank_direction
+    return attacks
+
+def _relevant_occupancy_mask(square: int, directions: List[tuple[int, int]]) -> int:
+    """
+        Squares whose occupancy can change the attack set, the last square of each ray never blocks anything
+    """
+    mask = 0
+    file = square & 7
+    rank = square >> 3
+    for file_direction, rank_direction in directions:
+        new_file = file + file_direction
+        new_rank = rank + rank_direction
+        while 0 <= new_file + file_direction < 8 and 0 <= new_rank + rank_direction < 8:
+            mask |= 1 << (new_rank * 8 + new_file)
+            new_file += file_direction
+            new_rank += rank_direction
+    return mask
+
+# Found offline by random search for the fixed shift 64 - popcount(mask)
+ROOK_MAGICS = [
+    0x00800124C0081080, 0x0240100040002004, 0x0200102200400880, 0x8080100080080004,
+    0x1080080002040081, 0x0180020080030400, 0x0400080201009430, 0x008001000058A280,
+    0x0001002041008005, 0x1060400040201006, 0x0082808020001000, 0x1241001001000B20,
+    0x1800800800040080, 0x001A001008050200, 0x0404808002000100, 0x0101000080510022,
+    0x0038450020800100, 0x0880404010002000, 0x0120010020110040, 0xC118808010000802,
+    0x01A0808008000400, 0x0008808002000400, 0x8180040001420810, 0x002206000042840B,
+    0x4000400180022080, 0x1200200240100242, 0x2200401100200100, 0x1062100480080082,
+    0x0208008880040080, 0x0000040080020080, 0x301A010080800200, 0x0000008200004124,
+    0x9880004000402000, 0x04D0002000400052, 0x1000410019002000, 0x0008420012002008,
+    0x0800800400800801, 0x0078020080800400, 0x300008A204000110, 0x4000408042000104,
+    0x0840008000488020, 0x0010002000404000, 0x0052004080120020, 0x0A21041000090020,
+    0x50B0040801010010, 0x2002000804010100, 0x0500080102040010, 0x0200410040820004,
+    0x0016010044208200, 0x8000822004400880, 0x0000402200108200, 0x1110000800801080,
+    0x0B18100500080100, 0x4900040002008080, 0x8801000402000100, 0x1100008054090200,
+    0x0001044020108003, 0x0002022248801102, 0x4002001020420982, 0x6000200C400A0006,
+    0x8102010810200402, 0x5002004408015002, 0x6000100201208804, 0xC418130408204082,
+]
+BISHOP_MAGICS = [
+    0x2120241040850010, 0x0010301214822418, 0x0008182040844000, 0x0A08208020000C40,
+    0x010510C008000000, 0x180082A060000490, 0x02430C0202415400, 0x0010440218020208,
+    0x41000AD090008100, 0x4008100420940048, 0x0A00410401004002, 0x6200082042401600,
+    0x0411240420010000, 0x0200010160100CA0, 0x200080849010D002, 0x2210011042100414,
+    0x8004926028300100, 0x8010000210210104, 0x0008000488210200, 0x0324008202120000,
+    0x040C022480A00182, 0x0009404201100154, 0x1A10441108267020, 0x0800890C40441000,
+    0x0422206208085018, 0x00B00800302200A6, 0xA000404084010202, 0x2008840008041010,
+    0x4020808010082000, 0x040081018A010080, 0x200102000110B000, 0x01140080810090B2,
+    0x0010090410610400, 0x8008121302880804, 0x8204020100122400, 0x0000200800190050,
+    0x2062020200040084, 0x02A0208082810800, 0x4010010240010C38, 0x0001640020010100,
+    0x1002100C14006100, 0x0804020804244201, 0x0304101088001011, 0x420800205800C302,
+    0x1000284100401400, 0xE011410116000B00, 0x4408020444003C48, 0x0810208081003080,
+    0x000088084210A842, 0x0082009094300200, 0x411002004A088802, 0x008A000784340000,
+    0x0008910810240008, 0x00000A2008208044, 0x0008488800A41404, 0x0002841440820022,
+    0x014A044048280800, 0x0042090041046000, 0x0600212044240400, 0x0010400000208840,
+    0x0240020010820200, 0x0020840410820208, 0x0400222002008101, 0x4121041002004211,
+]
+
+def _magic_table(square: int, mask: int, magic: int, directions: List[tuple[int, int]]) -> List[int]:
+    shift = 64 - mask.bit_count()
+    table = [0] * (1 << mask.bit_count())
+    subset = 0
+    while True:
+        table[((subset * magic) & FULL) >> shift] = slider_attacks(square, subset, directions)
+        subset = (subset - mask) & mask
+        if subset == 0:
+            return table
+
+ROOK_MASKS: List[int] = [_relevant_occupancy_mask(square, ROOK_DIRECTIONS) for square in range(64)]
+BISHOP_MASKS: List[int] = [_relevant_occupancy_mask(square, BISHOP_DIRECTIONS) for square in range(64)]
+ROOK_SHIFTS: List[int] = [64 - mask.bit_count() for mask in ROOK_MASKS]
+BISHOP_SHIFTS: List[int] = [64 - mask.bit_count() for mask in BISHOP_MASKS]
+ROOK_TABLES: List[List[int]] = [_magic_table(square, ROOK_MASKS[square], ROOK_MAGICS[square], ROOK_DIRECTIONS) for square in range(64)]
+BISHOP_TABLES: List[List[int]] = [_magic_table(square, BISHOP_MASKS[square], BISHOP_MAGICS[square], BISHOP_DIRECTIONS) for square in range(64)]
+
+def rook_attacks(square: int, occupancy: int) -> int:
+    return ROOK_TABLES[square][((occupancy & ROOK_MASKS[square]) * ROOK_MAGICS[square] & FULL) >> ROOK_SHIFTS[square]]
+
+def bishop_attacks(square: int, occupancy: int) -> int:
+    return BISHOP_TABLES[square][((occupancy & BISHOP_MASKS[square]) * BISHOP_MAGICS[square] & FULL) >> BISHOP_SHIFTS[square]]
+
+def queen_attacks(square: int, occupancy: int) -> int:
+    return rook_attacks(square, occupancy) | bishop_attacks(square, occupancy)
+
+def _between(start: int, end: int) -> int:
+    """
+        Squares strictly between start and end when they share a rank, file or diagonal, else 0
+    """
+    file_difference = (end & 7) - (start & 7)
+    rank_difference = (end >> 3) - (start >> 3)
+    if start == end or (file_difference and rank_difference and abs(file_difference) != abs(rank_difference)):
+        return 0
+    step = (rank_difference > 0) - (rank_difference < 0)
+    step = step * 8 + (file_difference > 0) - (file_difference < 0)
+    mask = 0
+    square = start + step
+    while square != end:
+        mask |= 1 << square
+        square += step
+    return mask
+
+# Indexed [start][end]
+BETWEEN: List[List[int]] = [[_between(start, end) for end in range(64)] for start in range(64)]
+
+def checkers_and_pins(king: int, color: int, own: int, occupancy: int, pawns: int, knights: int, diagonal: int, orthogonal: int) -> tuple[int, dict[int, int]]:
+    """
+        Scans the rays out of the king once for the side of color
+        Input: own: Occupancy of color, pawns to orthogonal: Enemy bitboards, diagonal = bishops | queens, orthogonal = rooks | queens
+        Returns: Bitboard of the enemy pieces giving check, and the square index of every absolutely pinned piece
+        mapped to the squares it may still move to, the ray up to and including its pinner
+    """
+    checkers = (KNIGHT_ATTACKS[king] & knights) | (PAWN_ATTACKS[color][king] & pawns)
+    pins = {}
+    for sliders, attacks in ((diagonal, bishop_attacks), (orthogonal, rook_attacks)):
+        if not sliders:
+            continue
+        seen = attacks(king, occupancy)
+        checkers |= seen & sliders
+        # Lifting the first own piece on every ray shows which sliders were behind it
+        for pinner in squares_of(attacks(king, occupancy ^ (seen & own)) & sliders & ~seen):
+            ray = BETWEEN[king][pinner]
+            pins[(ray & own).bit_length() - 1] = ray | (1 << pinner)
+    return checkers, pins
+
+def check_mask(king: int, checkers: int) -> int:
+    """
+        Returns: Squares a piece other than the king can move to so it stops the check, FULL when not in check, 0 in double check
+    """
+    if not checkers:
+        return FULL
+    if checkers & (checkers - 1):
+        return 0
+    return checkers | BETWEEN[king][checkers.bit_length() - 1]
+
+def attacked_squares(color: int, occupancy: int, pawns: int, knights: int, diagonal: int, orthogonal: int, king: int) -> int:
+    """
+        Input: The bitboards of color, occupancy should leave out the defending king so it cannot hide behind itself on a ray
+        Returns: Every square color attacks
+    """
+    attacked = 0
+    for square in squares_of(pawns):
+        attacked |= PAWN_ATTACKS[color][square]
+    for square in squares_of(knights):
+        attacked |= KNIGHT_ATTACKS[square]
+    for square in squares_of(diagonal):
+        attacked |= bishop_attacks(square, occupancy)
+    for square in squares_of(orthogonal):
+        attacked |= rook_attacks(square, occupancy)
+    for square in squares_of(king):
+        attacked |= KING_ATTACKS[square]
+    return attacked
@@ -0,0 +1,502 @@
+from __future__ import annotations
+from array import array
+from typing import TYPE_CHECKING, Iterator, List
+from ChessRules import BaseChessBoard, ChessError, Move, Square, Color, White, Black
+from PackedMove import ENPASSANT, KINGSIDE_CASTLE, QUEENSIDE_CASTLE, PROMOTION, pack_move
+from Zobrist import PIECE_KEYS, CASTLING_KEYS, ENPASSANT_KEYS, SIDE_KEY
+from Evaluation import MIDDLEGAME_TABLES, ENDGAME_TABLES, MATERIAL, PHASES
+if TYPE_CHECKING:
+    from NeuralEvaluation import Accumulator
+from AttackTables import WHITE, BLACK, FULL, RANK_1, RANK_3, RANK_6, RANK_8, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, squares_of, rook_attacks, bishop_attacks, queen_attacks, checkers_and_pins, check_mask, attacked_squares
+
+PAWN = 0
+KNIGHT = 1
+BISHOP = 2
+ROOK = 3
+QUEEN = 4
+KING = 5
+NO_PIECE = -1
+
+PIECE_CHARACTERS = "PNBRQKpnbrqk"
+
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+
+SQUARES = [Square(index % 8, index // 8) for index in range(64)]
+# Queen first so the likeliest promotion is generated first
+PROMOTION_SPECIALS = [PROMOTION + QUEEN - 1, PROMOTION + ROOK - 1, PROMOTION + BISHOP - 1, PROMOTION + KNIGHT - 1]
+
+# Castling rights that survive a move touching each square
+CASTLING_MASK = [0xF] * 64
+CASTLING_MASK[0] = 0xF & ~WHITE_QUEENSIDE
+CASTLING_MASK[4] = 0xF & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASK[7] = 0xF & ~WHITE_KINGSIDE
+CASTLING_MASK[56] = 0xF & ~BLACK_QUEENSIDE
+CASTLING_MASK[60] = 0xF & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASK[63] = 0xF & ~BLACK_KINGSIDE
+
+class BitboardChessBoard(BaseChessBoard):
+    """
+        Position stored as twelve 64 bit piece bitboards (white PNBRQK then black pnbrqk, bit 0 = a1, bit 63 = h8)
+        plus per side occupancy masks and a square to piece mailbox for captures
+    """
+    def __init__(self):
+        self.bitboards: List[int] = [0] * 12
+        self.occupancy: List[int] = [0, 0]
+        self.mailbox: List[int] = [NO_PIECE] * 64
+        self.turn = WHITE
+        self.castling = 0
+        self.enpassant = -1
+        self.half_moves = 0
+        self.moves = 1
+        self.move_stack: List[tuple] = []
+        self.zobrist_key = CASTLING_KEYS[0]
+        # Zobrist key of the pawns alone, for the pawn hash table
+        self.pawn_key = 0
+        # Evaluation terms kept up to date by put_piece and take_piece, see Evaluation
+        self.material = 0
+        self.middlegame_score = 0
+        self.endgame_score = 0
+        self.phase = 0
+        # Neural evaluation first layer, built by static_eval when a network is loaded, pop undoes its updates like the scores
+        self.accumulator: Accumulator | None = None
+        # Reused by the queries that generate moves only to look at them
+        self.scratch = array('H')
+    @property
+    def color_to_move(self) -> Color:
+        return White() if self.turn == WHITE else Black()
+    @property
+    def enpassant_available(self) -> Square | None:
+        if self.enpassant < 0:
+            return None
+        return SQUARES[self.enpassant]
+    @property
+    def all_occupancy(self) -> int:
+        return self.occupancy[WHITE] | self.occupancy[BLACK]
+    def put_piece(self, piece: int, square: int) -> None:
+        bit = 1 << square
+        self.bitboards[piece] |= bit
+        self.occupancy[piece // 6] |= bit
+        self.mailbox[square] = piece
+        self.zobrist_key ^= PIECE_KEYS[piece][square]
+        if piece % 6 == PAWN:
+            self.pawn_key ^= PIECE_KEYS[piece][square]
+        self.material += MATERIAL[piece]
+        self.middlegame_score += MIDDLEGAME_TABLES[piece][square]
+        self.endgame_score += ENDGAME_TABLES[piece][square]
+        self.phase += PHASES[piece]
+        if self.accumulator != None:
+            self.accumulator.add(piece, square)
+    def take_piece(self, square: int) -> int:
+        piece = self.mailbox[square]
+        bit = 1 << square
+        self.bitboards[piece] ^= bit
+        self.occupancy[piece // 6] ^= bit
+        self.mailbox[square] = NO_PIECE
+        self.zobrist_key ^= PIECE_KEYS[piece][square]
+        if piece % 6 == PAWN:
+            self.pawn_key ^= PIECE_KEYS[piece][square]
+        self.material -= MATERIAL[piece]
+        self.middlegame_score -= MIDDLEGAME_TABLES[piece][square]
+        self.endgame_score -= ENDGAME_TABLES[piece][square]
+        self.phase -= PHASES[piece]
+        if self.accumulator != None:
+            self.accumulator.remove(piece, square)
+        return piece
+    def compute_zobrist_key(self) -> int:
+        """
+            Builds the Zobrist key from scratch, push keeps self.zobrist_key up to date incrementally
+        """
+        key = CASTLING_KEYS[self.castling]
+        for square, piece in enumerate(self.mailbox):
+            if piece != NO_PIECE:
+                key ^= PIECE_KEYS[piece][square]
+        if self.enpassant >= 0:
+            key ^= ENPASSANT_KEYS[self.enpassant & 7]
+        if self.turn == BLACK:
+            key ^= SIDE_KEY
+        return key
+    def pawn_bitboards(self) -> tuple[int, int]:
+        return self.bitboards[PAWN], self.bitboards[6 + PAWN]
+    def piece_codes(self) -> List[int]:
+        # NO_PIECE is -1, so the empty squares come out as 0
+        return [piece + 1 for piece in self.mailbox]
+    def king_square(self, color: int) -> int:
+        return self.bitboards[color * 6 + KING].bit_length() - 1
+    def attacks(self, color: Color) -> List[int]:
+        """
+            Returns: How many of color's pieces attack each square index, defended squares included
+            Computed on demand with a pass over color's pieces, push and pop do not keep counts as ChessBoard's do,
+            so keep it out of hot paths: move generation and the search use _is_attacked and attacked_squares
+        """
+        by_color = BLACK if color.is_black else WHITE
+        occupancy = self.occupancy[WHITE] | self.occupancy[BLACK]
+        counts = [0] * 64
+        for piece_type in range(6):
+            for square in squares_of(self.bitboards[by_color * 6 + piece_type]):
+                if piece_type == PAWN:
+                    attacks = PAWN_ATTACKS[by_color][square]
+                elif piece_type == KNIGHT:
+                    attacks = KNIGHT_ATTACKS[square]
+                elif piece_type == BISHOP:
+                    attacks = bishop_attacks(square, occupancy)
+                elif piece_type == ROOK:
+                    attacks = rook_attacks(square, occupancy)
+                elif piece_type == QUEEN:
+                    attacks = queen_attacks(square, occupancy)
+                else:
+                    attacks = KING_ATTACKS[square]
+                for target in squares_of(attacks):
+                    counts[target] += 1
+        return counts
+    def is_attacked(self, square: int, color: Color) -> bool:
+        """
+            Input: Square index
+            Returns: Whether any of color's pieces attacks the square
+        """
+        return self._is_attacked(square, BLACK if color.is_black else WHITE)
+    def _is_attacked(self, square: int, by_color: int) -> bool:
+        offset = by_color * 6
+        bitboards = self.bitboards
+        if KNIGHT_ATTACKS[square] & bitboards[offset + KNIGHT]:
+            return True
+        if PAWN_ATTACKS[by_color ^ 1][square] & bitboards[offset + PAWN]:
+            return True
+        if KING_ATTACKS[square] & bitboards[offset + KING]:
+            return True
+        occupancy = self.occupancy[WHITE] | self.occupancy[BLACK]
+        queens = bitboards[offset + QUEEN]
+        if rook_attacks(square, occupancy) & (bitboards[offset + ROOK] | queens):
+            return True
+        if bishop_attacks(square, occupancy) & (bitboards[offset + BISHOP] | queens):
+            return True
+        return False
+    def check_check(self, defendingSide: Color | None = None) -> bool:
+        color = self.turn
+        if defendingSide == White():
+            color = WHITE
+        elif defendingSide == Black():
+            color = BLACK
+        return self._is_attacked(self.king_square(color), color ^ 1)
+    def get_rudimentary_eval(self) -> int:
+        eval = self.material
+        if self.check_check():
+            if not self.has_legal_move():
+                if self.turn == BLACK:
+                    return float("inf")
+                else:
+                    return float("-inf")
+        return eval
+    def generate_pseudo_legal(self, buffer: array, captures_only: bool = False, targets: int = FULL) -> array:
+        """
+            Fills buffer with the packed moves of the side to move, ignoring whether they leave its king in check
+            captures_only: Only captures and promotions
+            targets: Squares pieces other than the king may move to, en passant is always generated
+            Returns: buffer
+        """
+        del buffer[:]
+        append = buffer.append
+        color = self.turn
+        offset = color * 6
+        own = self.occupancy[color]
+        enemy = self.occupancy[color ^ 1]
+        occupancy = own | enemy
+        empty = ~occupancy & FULL
+        bitboards = self.bitboards
+        targets_mask = (enemy if captures_only else ~own & FULL) & targets
+
+        pawns = bitboards[offset + PAWN]
+        if color == WHITE:
+            single = (pawns << 8) & empty
+            double = ((single & RANK_3) << 8) & empty
+            forward = 8
+            last_rank = RANK_8
+        else:
+            single = (pawns >> 8) & empty
+            double = ((single & RANK_6) >> 8) & empty
+            forward = -8
+            last_rank = RANK_1
+        if captures_only:
+            single &= last_rank
+            double = 0
+        single_targets = single & targets
+        for to in squares_of(single_targets & last_rank):
+            for special in PROMOTION_SPECIALS:
+                append(pack_move(to - forward, to, special))
+        for to in squares_of(single_targets & ~last_rank):
+            append(pack_move(to - forward, to))
+        for to in squares_of(double & targets):
+            append(pack_move(to - 2 * forward, to))
+        for square in squares_of(pawns):
+            for to in squares_of(PAWN_ATTACKS[color][square] & enemy & targets):
+                if (1 << to) & last_rank:
+                    for special in PROMOTION_SPECIALS:
+                        append(pack_move(square, to, special))
+                else:
+                    append(pack_move(square, to))
+            if self.enpassant >= 0 and PAWN_ATTACKS[color][square] & (1 << self.enpassant):
+                append(pack_move(square, self.enpassant, ENPASSANT))
+
+        for square in squares_of(bitboards[offset + KNIGHT]):
+            for to in squares_of(KNIGHT_ATTACKS[square] & targets_mask):
+                append(square | (to << 6))
+        for square in squares_of(bitboards[offset + BISHOP]):
+            for to in squares_of(bishop_attacks(square, occupancy) & targets_mask):
+                append(square | (to << 6))
+        for square in squares_of(bitboards[offset + ROOK]):
+            for to in squares_of(rook_attacks(square, occupancy) & targets_mask):
+                append(square | (to << 6))
+        for square in squares_of(bitboards[offset + QUEEN]):
+            for to in squares_of(queen_attacks(square, occupancy) & targets_mask):
+                append(square | (to << 6))
+        king = self.king_square(color)
+        for to in squares_of(KING_ATTACKS[king] & (enemy if captures_only else ~own & FULL)):
+            append(king | (to << 6))
+        if captures_only or targets != FULL:
+            return buffer
+
+        kingside = WHITE_KINGSIDE if color == WHITE else BLACK_KINGSIDE
+        queenside = WHITE_QUEENSIDE if color == WHITE else BLACK_QUEENSIDE
+        if self.castling & (kingside | queenside) and not self._is_attacked(king, color ^ 1):
+            if self.castling & kingside and not occupancy & (0b11 << (king + 1)) and not self._is_attacked(king + 1, color ^ 1):
+                append(pack_move(king, king + 2, KINGSIDE_CASTLE))
+            if self.castling & queenside and not occupancy & (0b111 << (king - 3)) and not self._is_attacked(king - 1, color ^ 1):
+                append(pack_move(king, king - 2, QUEENSIDE_CASTLE))
+        return buffer
+    def is_legal(self, move: Move | int) -> bool:
+        color = self.turn
+        self.push(move)
+        is_legal = not self._is_attacked(self.king_square(color), color ^ 1)
+        self.pop()
+        return is_legal
+    def generate_evasions(self, buffer: array, checkers: int, captures_only: bool = False) -> array:
+        """
+            Like generate_pseudo_legal when in check: king moves, and in single check only captures of the checker and blocks
+        """
+        return self.generate_pseudo_legal(buffer, captures_only, check_mask(self.king_square(self.turn), checkers))
+    def _legality(self) -> tuple[int, int, dict[int, int], int]:
+        """
+            Returns: The king square of the side to move, the checkers and pins from checkers_and_pins,
+            and the squares the opponent attacks with the king lifted off the board
+        """
+        color = self.turn
+        enemy = (color ^ 1) * 6
+        bitboards = self.bitboards
+        occupancy = self.occupancy[WHITE] | self.occupancy[BLACK]
+        king = self.king_square(color)
+        pawns = bitboards[enemy + PAWN]
+        knights = bitboards[enemy + KNIGHT]
+        diagonal = bitboards[enemy + BISHOP] | bitboards[enemy + QUEEN]
+        orthogonal = bitboards[enemy + ROOK] | bitboards[enemy + QUEEN]
+        checkers, pins = checkers_and_pins(king, color, self.occupancy[color], occupancy, pawns, knights, diagonal, orthogonal)
+        attacked = attacked_squares(color ^ 1, occupancy ^ (1 << king), pawns, knights, diagonal, orthogonal, bitboards[enemy + KING])
+        return king, checkers, pins, attacked
+    def _keep_legal(self, buffer: array, king: int, pins: dict[int, int], attacked: int, first_only: bool = False) -> array:
+        """
+            Keeps pinned pieces on their pin rays and the king off attacked squares instead of making every move,
+            only en passant, which can uncover the king along the rank, is still made and tested
+            first_only: Stop after the first legal move
+        """
+        count = 0
+        for move in buffer:
+            start = move & 0x3F
+            if start == king:
+                is_legal = not attacked >> ((move >> 6) & 0x3F) & 1
+            elif move >> 12 == ENPASSANT:
+                is_legal = self.is_legal(move)
+            elif start in pins:
+                is_legal = pins[start] >> ((move >> 6) & 0x3F) & 1
+            else:
+                is_legal = True
+            if is_legal:
+                buffer[count] = move
+                count += 1
+                if first_only:
+                    break
+        del buffer[count:]
+        return buffer
+    def _generate_legal(self, buffer: array, captures_only: bool) -> array:
+        king, checkers, pins, attacked = self._legality()
+        if checkers:
+            self.generate_evasions(buffer, checkers, captures_only)
+        else:
+            self.generate_pseudo_legal(buffer, captures_only)
+        return self._keep_legal(buffer, king, pins, attacked)
+    def has_legal_move(self) -> bool:
+        """
+            Tries king moves, then captures of the checker, then everything else, stopping at the first legal move
+        """
+        king, checkers, pins, attacked = self._legality()
+        if KING_ATTACKS[king] & ~self.occupancy[self.turn] & ~attacked:
+            return True
+        if checkers & (checkers - 1):
+            return False
+        buffer = self.scratch
+        for targets in (checkers, check_mask(king, checkers)) if checkers else (FULL,):
+            if self._keep_legal(self.generate_pseudo_legal(buffer, False, targets), king, pins, attacked, True):
+                return True
+        return False
+    def legal_move_count(self) -> int:
+        return len(self._generate_legal(self.scratch, False))
+    def generate_moves(self, buffer: array) -> array:
+        return self._generate_legal(buffer, False)
+    def generate_captures(self, buffer: array) -> array:
+        return self._generate_legal(buffer, True)
+    def pseudo_legal_moves(self) -> List[Move]:
+        return [self.to_move(move) for move in self.generate_pseudo_legal(array('H'))]
+    def pseudo_legal_captures(self) -> List[Move]:
+        return [self.to_move(move) for move in self.generate_pseudo_legal(array('H'), True)]
+    def legal_moves(self) -> List[Move]:
+        return [self.to_move(move) for move in self.generate_moves(array('H'))]
+    def iter_moves(self) -> Iterator[Move]:
+        """
+            Generates the packed moves up front, they are cheap, and only builds a Move for each one consumed
+        """
+        for move in self.generate_moves(array('H')):
+            yield self.to_move(move)
+    def legal_captures(self) -> List[Move]:
+        return [self.to_move(move) for move in self.generate_captures(array('H'))]
+    def piece_type_at(self, square: int) -> int:
+        piece = self.mailbox[square]
+        if piece == NO_PIECE:
+            return NO_PIECE
+        return piece % 6
+    def push(self, move: Move | int) -> None:
+        """
+            Makes the move, a Move or a packed move, in place and remembers enough to take it back with pop
+        """
+        if not isinstance(move, int):
+            move = move.packed
+        start = move & 0x3F
+        to = (move >> 6) & 0x3F
+        piece = self.mailbox[start]
+        if piece == NO_PIECE:
+            raise ChessError(f"No piece to move on {SQUARES[start].file}{SQUARES[start].rank}")
+        color = piece // 6
+        piece_type = piece % 6
+        captured = self.mailbox[to]
+        zobrist_key = self.zobrist_key
+        if piece_type == PAWN and to == self.enpassant:
+            captured = self.take_piece(to - 8 if color == WHITE else to + 8)
+        elif captured != NO_PIECE:
+            self.take_piece(to)
+        self.move_stack.append((move, piece, captured, self.castling, self.enpassant, self.half_moves, self.moves, zobrist_key))
+        self.zobrist_key ^= CASTLING_KEYS[self.castling] ^ SIDE_KEY
+        if self.enpassant >= 0:
+            self.zobrist_key ^= ENPASSANT_KEYS[self.enpassant & 7]
+
+        self.take_piece(start)
+        if piece_type == PAWN:
+            if to >= 56 or to < 8:
+                special = move >> 12
+                piece = color * 6 + (special - PROMOTION + 1 if special >= PROMOTION else QUEEN)
+        elif piece_type == KING and abs(to - start) == 2:
+            if to > start:
+                self.put_piece(self.take_piece(start + 3), start + 1)
+            else:
+                self.put_piece(self.take_piece(start - 4), start - 1)
+        self.put_piece(piece, to)
+
+        self.castling &= CASTLING_MASK[start] & CASTLING_MASK[to]
+        self.enpassant = -1
+        if piece_type == PAWN and abs(to - start) == 16:
+            self.enpassant = (start + to) // 2
+            self.zobrist_key ^= ENPASSANT_KEYS[self.enpassant & 7]
+        self.zobrist_key ^= CASTLING_KEYS[self.castling]
+        if piece_type == PAWN or captured != NO_PIECE:
+            self.half_moves = 0
+        else:
+            self.half_moves += 1
+        if color == BLACK:
+            self.moves += 1
+        self.turn ^= 1
+    def pop(self) -> int:
+        """
+            Returns: The packed move taken back
+        """
+        move, piece, captured, self.castling, self.enpassant, self.half_moves, self.moves, zobrist_key = self.move_stack.pop()
+        self.turn ^= 1
+        start = move & 0x3F
+        to = (move >> 6) & 0x3F
+        color = piece // 6
+        self.take_piece(to)
+        self.put_piece(piece, start)
+        if piece % 6 == PAWN and to == self.enpassant:
+            self.put_piece(captured, to - 8 if color == WHITE else to + 8)
+        elif captured != NO_PIECE:
+            self.put_piece(captured, to)
+        elif piece % 6 == KING and abs(to - start) == 2:
+            if to > start:
+                self.put_piece(self.take_piece(start + 1), start + 3)
+            else:
+                self.put_piece(self.take_piece(start - 1), start - 4)
+        self.zobrist_key = zobrist_key
+        return move
+    @staticmethod
+    def create_starting_board() -> BitboardChessBoard:
+        return BitboardChessBoard.from_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+    @staticmethod
+    def from_fen(fen: str) -> BitboardChessBoard:
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError("Invalid FEN")
+        board = BitboardChessBoard()
+        rank = 7
+        file = 0
+        for character in fields[0]:
+            if character == '/':
+                rank -= 1
+                file = 0
+            elif '1' <= character <= '8':
+                file += int(character)
+            else:
+                piece = PIECE_CHARACTERS.find(character)
+                if piece < 0 or file > 7 or rank < 0:
+                    raise ValueError("Invalid FEN")
+                board.put_piece(piece, rank * 8 + file)
+                file += 1
+        if fields[1] == 'w':
+            board.turn = WHITE
+        elif fields[1] == 'b':
+            board.turn = BLACK
+        else:
+            raise ValueError("Invalid FEN")
+        for character, right in (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE), ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE)):
+            if character in fields[2]:
+                board.castling |= right
+        if fields[3] != '-':
+            board.enpassant = (int(fields[3][1]) - 1) * 8 + ord(fields[3][0].lower()) - ord('a')
+        if len(fields) > 4:
+            board.half_moves = int(fields[4])
+        if len(fields) > 5:
+            board.moves = int(fields[5])
+        board.zobrist_key = board.compute_zobrist_key()
+        return board
+    @property
+    def fen(self) -> str:
+        ranks = []
+        for rank in range(7, -1, -1):
+            row = ""
+            empty = 0
+            for file in range(8):
+                piece = self.mailbox[rank * 8 + file]
+                if piece == NO_PIECE:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += PIECE_CHARACTERS[piece]
+            if empty:
+                row += str(empty)
+            ranks.append(row)
+        castling = ""
+        for character, right in (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE), ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE)):
+            if self.castling & right:
+                castling += character
+        enpassant = "-"
+        if self.enpassant >= 0:
+            enpassant = SQUARES[self.enpassant].file + str(SQUARES[self.enpassant].rank)
+        return "/".join(ranks) + (" w " if self.turn == WHITE else " b ") + (castling or "-") + " " + enpassant + " " + str(self.half_moves) + " " + str(self.moves)
@@ -1,19 +1,110 @@
 from __future__ import annotations
 import typing
-from typing import List, Type
+import atexit
+from typing import Iterator, List, Type
 import platform
 import random
 import time
 import copy
-import warnings
+from array import array
 from multiprocessing import Pool
+from Search import Searcher, LazySmpHelpers
+from TranspositionTable import TranspositionTable, SharedTranspositionTable
+from MoveOrdering import MoveOrderer
+from EvaluationCache import EvaluationCache, PawnHashTable
+from PackedMove import NORMAL, ENPASSANT, KINGSIDE_CASTLE, QUEENSIDE_CASTLE, PROMOTION, pack_move
+from Zobrist import PIECE_KEYS, CASTLING_KEYS, ENPASSANT_KEYS, SIDE_KEY
+from Evaluation import POINTS, MIDDLEGAME_TABLES, ENDGAME_TABLES, MATERIAL, PHASES, tapered
+from AttackTables import FULL, KNIGHT_SQUARES, KING_SQUARES, PAWN_SQUARES, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, squares_of, rook_attacks, bishop_attacks, queen_attacks, checkers_and_pins, check_mask
+try:
+    from NeuralEvaluation import Network, Accumulator, load_network
+except ImportError:
+    # The neural evaluation needs NumPy, without it static_eval always uses the hand-written terms
+    load_network = None
 
 seed = time.time_ns()
 print(f'{seed = }')
 random.seed(seed)
 
+# Shared by every search in this process so results carry over from one move to the next
+transposition_table = TranspositionTable(16)
+move_orderer = MoveOrderer()
+evaluation_cache = EvaluationCache(4)
+pawn_hash_table = PawnHashTable(1)
+# Evaluates positions instead of the hand-written terms when a weights file is found, see use_network
+network: Network | None = load_network() if load_network != None else None
+# Worker processes make_best_move_half_depth splits the root moves over, started on first use, see search_pool
+_search_pool: Pool | None = None
+_search_pool_workers = 0
+# Helper processes make_best_move_in_time searches with and the table they share, started on first use, see lazy_smp_helpers
+_lazy_smp_helpers: LazySmpHelpers | None = None
+
+def new_game() -> None:
+    """
+        Forgets what the shared tables learned from the previous game
+    """
+    transposition_table.clear()
+    move_orderer.clear()
+    evaluation_cache.clear()
+    pawn_hash_table.clear()
+    # The workers keep tables of their own
+    close_search_pool()
+    if _lazy_smp_helpers != None:
+        _lazy_smp_helpers.transposition_table.clear()
+
+def search_pool(workers: int) -> Pool:
+    """
+        Returns: The process pool kept for the rest of the process, only started again when workers changes
+    """
+    global _search_pool, _search_pool_workers
+    if _search_pool == None or _search_pool_workers != workers:
+        close_search_pool()
+        _search_pool = Pool(workers)
+        _search_pool_workers = workers
+    return _search_pool
+
+def close_search_pool() -> None:
+    global _search_pool
+    if _search_pool != None:
+        _search_pool.close()
+        _search_pool.join()
+        _search_pool = None
+
+def lazy_smp_helpers(workers: int) -> LazySmpHelpers:
+    """
+        Returns: workers - 1 helper processes and their shared table, kept for the rest of the process, only started again when workers changes
+    """
+    global _lazy_smp_helpers
+    if _lazy_smp_helpers == None or len(_lazy_smp_helpers) != workers - 1:
+        close_lazy_smp_helpers()
+        _lazy_smp_helpers = LazySmpHelpers(SharedTranspositionTable(transposition_table.size_mb), workers - 1)
+    return _lazy_smp_helpers
+
+def close_lazy_smp_helpers() -> None:
+    global _lazy_smp_helpers
+    if _lazy_smp_helpers != None:
+        _lazy_smp_helpers.close()
+        _lazy_smp_helpers.transposition_table.close()
+        _lazy_smp_helpers = None
+
+atexit.register(close_search_pool)
+atexit.register(close_lazy_smp_helpers)
+
+def use_network(path: str | None) -> bool:
+    """
+        Input: path: Weights file for NeuralEvaluation, None goes back to the hand-written evaluation
+        Returns: Whether static_eval now uses a network, False if the file or NumPy is missing
+    """
+    global network
+    network = load_network(path) if path != None and load_network != None else None
+    # Cached scores came from the other evaluation, and the workers were started with it
+    evaluation_cache.clear()
+    close_search_pool()
+    close_lazy_smp_helpers()
+    return network != None
+
 def make_best_move(chessboard: ChessBoard) -> tuple[Move, ChessBoard]:
-    return chessboard.make_best_move_half_depth(False)
+    return chessboard.make_best_move_half_depth(inplace=False)
 
 class ChessError(Exception):
     def __init__(self, message: str):
@@ -30,6 +121,31 @@ class Move:
         self.start_square = start_square
         self.end_square = end_square
         self.promotion_piece = promotion_piece
+    @property
+    def packed(self) -> int:
+        """
+            Returns: The move as a 16 bit int in the PackedMove layout
+        """
+        special = 0
+        if self.promotion_piece != None:
+            special = PROMOTION + self.promotion_piece.piece_type - 1
+        elif self.is_enpassant:
+            special = ENPASSANT
+        elif self.is_kingside_castle:
+            special = KINGSIDE_CASTLE
+        elif self.is_queenside_castle:
+            special = QUEENSIDE_CASTLE
+        return pack_move(self.start_square.index, self.end_square.index, special)
+    @staticmethod
+    def from_packed(packed: int) -> Move:
+        """
+            Returns: The Move for a packed move, is_taking is left False as only the board knows it
+        """
+        start = packed & 0x3F
+        end = (packed >> 6) & 0x3F
+        special = packed >> 12
+        promotion_piece = (Knight, Bishop, Rook, Queen)[special - PROMOTION] if special >= PROMOTION else None
+        return Move(Square(start % 8, start // 8), Square(end % 8, end // 8), is_kingside_castle=special == KINGSIDE_CASTLE, is_queenside_castle=special == QUEENSIDE_CASTLE, is_enpassant=special == ENPASSANT, promotion_piece=promotion_piece)
     def to_long_move(self) -> str:
         promotion_string = ""
         if self.promotion_piece == Queen:
@@ -42,6 +158,26 @@ class Move:
             promotion_string = "n"
         return str(self.start_square.file) + str(self.start_square.rank) + str(self.end_square.file) + str(self.end_square.rank) +  promotion_string
 
+class MoveRecord:
+    """
+        Everything ChessBoard.pop needs to take back a move made with ChessBoard.push, move is the packed move
+    """
+    def __init__(self, move: int, piece: Piece, captured_piece: Piece, captured_index: int | None, promoted_piece: Piece | None, pawn_index: int | None, rook: Piece | None, castling_rights: tuple[bool, bool, bool, bool], enpassant_available: Square | None, half_moves: int, moves: int, zobrist_key: int, scores: tuple[int, int, int, int, int]):
+        self.move = move
+        self.piece = piece
+        self.captured_piece = captured_piece
+        self.captured_index = captured_index
+        self.promoted_piece = promoted_piece
+        self.pawn_index = pawn_index
+        self.rook = rook
+        self.castling_rights = castling_rights
+        self.enpassant_available = enpassant_available
+        self.half_moves = half_moves
+        self.moves = moves
+        self.zobrist_key = zobrist_key
+        # material, middlegame_score, endgame_score, phase and pawn_key before the move
+        self.scores = scores
+
 
 class Square:
     squares = [[None for rank in range(8)] for file in range(8)]
@@ -58,6 +194,7 @@ class Square:
         self._rank = rank
         self.file = chr(file + ord('a'))
         self.rank = rank + 1
+        self.index = rank * 8 + file
     @staticmethod
     def new_square(file: chr, rank: int):
         """
@@ -66,18 +203,273 @@ class Square:
         """
         return Square(ord(file.lower()) - ord('a'), rank - 1)
 
-class ChessBoard:
+class BaseChessBoard:
+    """
+        Behaviour shared by every position backend
+        A backend provides color_to_move, make_move, push, pop, legal_moves, piece_type_at, check_check and get_rudimentary_eval
+    """
+    @property
+    def color_to_move(self) -> Color:
+        raise NotImplementedError("Do not call color_to_move on base class: BaseChessBoard")
+    def make_moves(self, moves: List[Move | str | int]) -> None:
+        for move in moves:
+            self.make_move(move)
+    def make_move(self, move: Move | str | int) -> None:
+        """
+            Input: A generated Move, a packed move, or a long algebraic move like e2e4 or e7e8q
+        """
+        if isinstance(move, str):
+            move = self.parse_move(move)
+        self.push(move)
+    def parse_move(self, move: str) -> Move:
+        """
+            Input: Long algebraic move like e2e4 or e7e8q, a pawn reaching the last rank without a piece letter becomes a queen
+            Returns: The Move with its capture, castling, en passant and promotion flags read from this position
+        """
+        if len(move) < 4 or len(move) > 5:
+            raise ChessError(f"Invalid move: {move}")
+        start_file = ord(move[0].lower()) - ord('a')
+        start_rank = ord(move[1]) - ord('1')
+        end_file = ord(move[2].lower()) - ord('a')
+        end_rank = ord(move[3]) - ord('1')
+        if not (0 <= start_file < 8 and 0 <= start_rank < 8 and 0 <= end_file < 8 and 0 <= end_rank < 8):
+            raise ChessError(f"Invalid move: {move}")
+        start = start_rank * 8 + start_file
+        end = end_rank * 8 + end_file
+        piece_type = self.piece_type_at(start)
+        special = NORMAL
+        if len(move) == 5:
+            index = "nbrq".find(move[4].lower())
+            if index < 0:
+                raise ChessError(f"Invalid promotion piece in move: {move}")
+            special = PROMOTION + index
+        elif piece_type == King.piece_type and abs(end_file - start_file) == 2:
+            special = KINGSIDE_CASTLE if end_file > start_file else QUEENSIDE_CASTLE
+        elif piece_type == Pawn.piece_type and self.enpassant_available != None and end == self.enpassant_available.index:
+            special = ENPASSANT
+        return self.to_move(pack_move(start, end, special))
+    def is_legal(self, move: Move | int) -> bool:
+        color = self.color_to_move
+        self.push(move)
+        is_legal = not self.check_check(color)
+        self.pop()
+        return is_legal
+    def legal_captures(self) -> List[Move]:
+        """
+            Returns: The legal captures and promotions, the moves quiescence search extends leaves with
+        """
+        return [move for move in self.legal_moves() if move.is_enpassant or move.promotion_piece != None or self.piece_type_at(move.end_square.index) >= 0]
+    def generate_moves(self, buffer: array) -> array:
+        """
+            Input: array('H') to fill with the packed legal moves, whatever it held is replaced
+            Returns: buffer
+        """
+        del buffer[:]
+        buffer.extend(move.packed for move in self.legal_moves())
+        return buffer
+    def has_legal_move(self) -> bool:
+        """
+            Returns: Whether the side to move has a legal move, for telling checkmate and stalemate apart from a live position
+        """
+        return len(self.generate_moves(array('H'))) > 0
+    def legal_move_count(self) -> int:
+        return len(self.generate_moves(array('H')))
+    def static_eval(self) -> int:
+        """
+            Returns: Material, piece-square and pawn structure score in centipawns tapered by the game phase, positive favours white
+            Backends keep middlegame_score, endgame_score, phase and pawn_key up to date as pieces move,
+            the pawn structure terms come from the pawn hash table
+            With a network loaded the network's score is returned instead, from an accumulator built on first use and
+            then updated incrementally by the backend
+        """
+        if network != None:
+            return network.evaluate(self._network_accumulator(), self.color_to_move.is_black)
+        middlegame, endgame, _, _ = pawn_hash_table.evaluate(self)
+        return tapered(self.middlegame_score + middlegame, self.endgame_score + endgame, self.phase)
+    def _network_accumulator(self) -> Accumulator:
+        if self.accumulator == None or self.accumulator.network is not network:
+            self.accumulator = Accumulator(network, self.piece_codes())
+        return self.accumulator
+    def child_static_evals(self, moves: List[int]) -> List[int] | None:
+        """
+            Input: Packed legal moves
+            Returns: static_eval after each move, from one network call and without making the moves,
+                None without a network as the hand-written terms are already kept up to date move by move
+        """
+        if network == None or not moves:
+            return None
+        changes = [self.feature_changes(move) for move in moves]
+        return network.evaluate_children(self._network_accumulator(), changes, not self.color_to_move.is_black)
+    def feature_changes(self, move: int) -> tuple[int, int, int, int, int, int, int, int]:
+        """
+            Returns: The color * 6 + piece_type and square index of the two pieces the packed move puts down, then of the two it
+                picks up, piece -1 where there is no second one, the layout Network.evaluate_children reads
+        """
+        start = move & 0x3F
+        end = (move >> 6) & 0x3F
+        special = move >> 12
+        color = 6 if self.color_to_move.is_black else 0
+        piece = color + self.piece_type_at(start)
+        captured = -1, 0
+        if special == ENPASSANT:
+            captured = 6 - color, (start & 0x38) | (end & 7)
+        elif self.piece_type_at(end) >= 0:
+            captured = 6 - color + self.piece_type_at(end), end
+        promoted = piece
+        if piece - color == Pawn.piece_type and (end >= 56 or end < 8):
+            promoted = color + (special - PROMOTION + 1 if special >= PROMOTION else Queen.piece_type)
+        if special == KINGSIDE_CASTLE:
+            return promoted, end, color + Rook.piece_type, start + 1, piece, start, color + Rook.piece_type, start + 3
+        if special == QUEENSIDE_CASTLE:
+            return promoted, end, color + Rook.piece_type, start - 1, piece, start, color + Rook.piece_type, start - 4
+        return (promoted, end, -1, 0, piece, start) + captured
+    def attacks(self, color: Color) -> List[int]:
+        """
+            Returns: How many of color's pieces attack each square index, defended squares included
+            ChessBoard keeps the counts up to date as it moves, BitboardChessBoard counts them on each call
+        """
+        raise NotImplementedError("Do not call attacks on base class: BaseChessBoard")
+    def is_attacked(self, square: int, color: Color) -> bool:
+        """
+            Input: Square index
+            Returns: Whether any of color's pieces attacks the square
+        """
+        raise NotImplementedError("Do not call is_attacked on base class: BaseChessBoard")
+    def pawn_bitboards(self) -> tuple[int, int]:
+        """
+            Returns: Bitboards of the white pawns and the black pawns
+        """
+        raise NotImplementedError("Do not call pawn_bitboards on base class: BaseChessBoard")
+    def piece_codes(self) -> List[int]:
+        """
+            Returns: Code of the piece on every square index, 0 if it is empty, else color * 6 + piece_type + 1, the encoding Accumulator reads
+        """
+        raise NotImplementedError("Do not call piece_codes on base class: BaseChessBoard")
+    def generate_captures(self, buffer: array) -> array:
+        """
+            Like generate_moves for legal_captures
+        """
+        del buffer[:]
+        buffer.extend(move.packed for move in self.legal_captures())
+        return buffer
+    def to_move(self, packed: int) -> Move:
+        """
+            Returns: The packed move as a Move, with is_taking read from this position
+        """
+        move = Move.from_packed(packed)
+        move.is_taking = move.is_enpassant or self.piece_type_at(move.end_square.index) >= 0
+        return move
+    def child(self, move: Move) -> BaseChessBoard:
+        """
+            Returns a copy of the board with the move made, leaving this board untouched
+        """
+        board = copy.deepcopy(self)
+        board.push(move)
+        return board
+    def iter_moves(self) -> Iterator[Move]:
+        """
+            Yields the legal moves one at a time, a caller that stops early never builds the rest
+        """
+        yield from self.legal_moves()
+    def iter_children(self, inplace: bool = True) -> Iterator[tuple[Move, BaseChessBoard]]:
+        """
+            Yields each legal move with the position after it, one position at a time
+            inplace: The move is pushed on this board and popped when the next child is asked for or the generator is closed,
+            keep a child past that with copy.deepcopy. False yields an independent copy per move instead
+        """
+        for move in self.iter_moves():
+            if not inplace:
+                yield move, self.child(move)
+                continue
+            self.push(move)
+            try:
+                yield move, self
+            finally:
+                self.pop()
+    def get_moves(self) -> tuple[List[Move], List[BaseChessBoard]]:
+        """
+            Returns: Every legal move and a copy of the board after each, iter_children keeps only one position alive
+        """
+        moves = self.legal_moves()
+        chessboards = [self.child(move) for move in moves]
+        return moves, chessboards
+    def _play(self, move: Move, inplace: bool) -> tuple[Move, BaseChessBoard]:
+        if inplace:
+            self.push(move)
+            return move, self
+        return move, self.child(move)
+    def game_result(self) -> Color | None:
+        """
+            Returns: None while the side to move has a legal move, else the winning Color, NoColor() for stalemate
+        """
+        if self.has_legal_move():
+            return None
+        if self.check_check():
+            return Black() if self.color_to_move == White() else White()
+        return NoColor()
+    def make_best_move_half_depth(self, halfdepth: int = 2, inplace: bool = True, workers: int = 1) -> tuple[Move, BaseChessBoard] | Color:
+        """
+            Searches halfdepth half moves ahead with alpha-beta and plays one of the best moves
+            workers: Number of processes to split the root moves over, 1 searches in this process
+            Returns: The winning Color, or NoColor() for stalemate, instead when there is no move to play
+        """
+        result = self.game_result()
+        if result != None:
+            return result
+        searcher = Searcher(transposition_table=transposition_table, move_orderer=move_orderer, evaluation_cache=evaluation_cache)
+        if workers <= 1:
+            return self._play(searcher.best_move(self, halfdepth), inplace)
+        return self._play(searcher.best_move(self, halfdepth, search_pool(workers), workers), inplace)
+
+    def make_best_move_in_time(self, time_limit: float | None = None, max_depth: int = 64, node_limit: int | None = None, inplace: bool = True, workers: int = 1) -> tuple[Move, BaseChessBoard] | Color:
+        """
+            Deepens the search until time_limit seconds or node_limit nodes are used up and plays the best move of the deepest finished search
+            workers: Number of processes searching together Lazy SMP style through a shared transposition table, 1 searches in this process
+            Returns: The winning Color, or NoColor() for stalemate, instead when there is no move to play
+        """
+        game_result = self.game_result()
+        if game_result != None:
+            return game_result
+        if workers <= 1:
+            result = Searcher(transposition_table=transposition_table, move_orderer=move_orderer, evaluation_cache=evaluation_cache).iterative_deepening(self, max_depth, time_limit, node_limit)
+            return self._play(result.best_move, inplace)
+        helpers = lazy_smp_helpers(workers)
+        result = Searcher(transposition_table=helpers.transposition_table, move_orderer=move_orderer, evaluation_cache=evaluation_cache).lazy_smp(self, helpers, max_depth, time_limit, node_limit)
+        return self._play(result.best_move, inplace)
+
+    def make_best_move(self, inplace: bool = True) -> tuple[Move, BaseChessBoard] | Color:
+        result = self.game_result()
+        if result != None:
+            return result
+        move = Searcher(transposition_table=transposition_table, move_orderer=move_orderer, evaluation_cache=evaluation_cache).best_move(self, 1)
+        return self._play(move, inplace)
+
+class ChessBoard(BaseChessBoard):
     def __init__(self):
         self.white : Player = Player(color=White())
         self.black : Player = Player(color=Black())
         self.squares : List[List[Square]] = [[Square(file, rank) for rank in range(8)] for file in range(8)]
-        self.board : List[List[Piece]] = [[NoPiece(self.squares[file][rank]) for rank in range(8)] for file in range(8)]
+        self.no_pieces : List[List[NoPiece]] = [[NoPiece(self.squares[file][rank]) for rank in range(8)] for file in range(8)]
+        self.board : List[List[Piece]] = [[self.no_pieces[file][rank] for rank in range(8)] for file in range(8)]
         self._is_enpassant_available: bool = False
         self._enpassant_available: Square | None = None
         self.player_to_move = self.white
         self.waiting_player = self.black
         self.half_moves = 0
         self.moves = 0
+        self.move_stack: List[MoveRecord] = []
+        self.zobrist_key = 0
+        # Indexed [is_black], how many of the side's pieces attack each square index and the squares with any, defended squares included
+        self.attack_counts: List[List[int]] = [[0] * 64, [0] * 64]
+        self.attack_maps: List[int] = [0, 0]
+        # Evaluation terms kept up to date as pieces come and go, see Evaluation, and the Zobrist key of the pawns alone
+        self.pawn_key = 0
+        self.material = 0
+        self.middlegame_score = 0
+        self.endgame_score = 0
+        self.phase = 0
+        # Neural evaluation first layer, built by static_eval when a network is loaded
+        self.accumulator: Accumulator | None = None
     @property
     def enpassant_available(self) -> Square | None:
         return self._enpassant_available
@@ -92,132 +484,326 @@ class ChessBoard:
             return True
     def get_available_moves(self) -> List[Move]:
         raise NotImplementedError("Get Available Moves Has Not Been Implemented Yet")
+    @property
+    def occupancy(self) -> int:
+        return self.white.occupancy | self.black.occupancy
     def add_piece(self, piece: Piece) -> None:
         self.board[piece.square._file][piece.square._rank] = piece
         if (piece.is_white):
             self.white.add_piece(piece)
+            self.white.occupancy |= 1 << piece.square.index
         elif (piece.is_black):
             self.black.add_piece(piece)
+            self.black.occupancy |= 1 << piece.square.index
+        self._update_attacks(1 << piece.square.index, (), (piece,))
+        self._score_piece(piece, piece.square.index, 1)
     def remove_piece(self, piece: Piece) -> None:
-        self.board[piece.square._file][piece.square._rank] = NoPiece()
+        self.board[piece.square._file][piece.square._rank] = self.no_pieces[piece.square._file][piece.square._rank]
         if piece.is_white:
             self.white.remove_piece(piece)
+            self.white.occupancy &= ~(1 << piece.square.index)
         elif piece.is_black:
             self.black.remove_piece(piece)
+            self.black.occupancy &= ~(1 << piece.square.index)
+        self._update_attacks(1 << piece.square.index, (piece,), ())
+        self._score_piece(piece, piece.square.index, -1)
+    def _score_piece(self, piece: Piece, square: int, sign: int) -> None:
+        """
+            Adds (sign 1) or takes away (sign -1) the piece's evaluation terms on square
+        """
+        if piece.piece_type == Pawn.piece_type:
+            self.pawn_key ^= PIECE_KEYS[piece.zobrist_index][square]
+        self.material += sign * MATERIAL[piece.zobrist_index]
+        self.middlegame_score += sign * MIDDLEGAME_TABLES[piece.zobrist_index][square]
+        self.endgame_score += sign * ENDGAME_TABLES[piece.zobrist_index][square]
+        self.phase += sign * PHASES[piece.zobrist_index]
+        if self.accumulator != None:
+            if sign > 0:
+                self.accumulator.add(piece.zobrist_index, square)
+            else:
+                self.accumulator.remove(piece.zobrist_index, square)
+    def _set_attacks(self, piece: Piece, attacks: int) -> None:
+        """
+            Moves the side's attack counts from the piece's stored attack bitboard to attacks
+        """
+        counts = self.attack_counts[piece.is_black]
+        lost = piece.attack_mask & ~attacks
+        gained = attacks & ~piece.attack_mask
+        for square in squares_of(lost):
+            counts[square] -= 1
+            if not counts[square]:
+                self.attack_maps[piece.is_black] ^= 1 << square
+        for square in squares_of(gained):
+            counts[square] += 1
+            if counts[square] == 1:
+                self.attack_maps[piece.is_black] |= 1 << square
+        piece.attack_mask = attacks
+    def _update_attacks(self, changed: int, removed: typing.Iterable[Piece], moved: typing.Iterable[Piece]) -> None:
+        """
+            Input: changed: Squares whose occupancy changed, removed: Pieces taken off the board, moved: Pieces put on or moved,
+            None and NoPiece entries are skipped
+            Only sliders whose rays reach a changed square are recomputed, every other attack set is unchanged
+        """
+        for piece in removed:
+            if piece != None and piece.is_piece:
+                self._set_attacks(piece, 0)
+        for piece in moved:
+            if piece != None and piece.is_piece:
+                self._set_attacks(piece, piece.attack_bitboard())
+        for player in (self.white, self.black):
+            for piece in player.pieces:
+                if piece.is_slider and piece.attack_mask & changed:
+                    self._set_attacks(piece, piece.attack_bitboard())
+    def attacks(self, color: Color) -> List[int]:
+        """
+            Returns: How many of color's pieces attack each square index, defended squares included, kept up to date by push and pop
+        """
+        return self.attack_counts[color.is_black]
+    def is_attacked(self, square: int, color: Color) -> bool:
+        """
+            Input: Square index
+            Returns: Whether any of color's pieces attacks the square
+        """
+        return self.attack_maps[color.is_black] >> square & 1 == 1
     def __getitem__(self, key) -> Piece:
         return self.board[key]
     def __setitem__(self, key, new_value: Piece) -> None:
         self.board[key] = new_value
+    @property
+    def color_to_move(self) -> Color:
+        return self.player_to_move.color
+    @property
+    def castling_rights(self) -> int:
+        """
+            Returns: Castling rights as a bitmask, 1 = white kingside, 2 = white queenside, 4 = black kingside, 8 = black queenside
+        """
+        return self.white.can_kingside_castle | (self.white.can_queenside_castle << 1) | (self.black.can_kingside_castle << 2) | (self.black.can_queenside_castle << 3)
+    def compute_zobrist_key(self) -> int:
+        """
+            Builds the Zobrist key from scratch, push keeps self.zobrist_key up to date incrementally
+        """
+        key = CASTLING_KEYS[self.castling_rights]
+        for player in (self.white, self.black):
+            for piece in player.pieces:
+                key ^= PIECE_KEYS[piece.zobrist_index][piece.square.index]
+        if self._enpassant_available != None:
+            key ^= ENPASSANT_KEYS[self._enpassant_available._file]
+        if self.player_to_move.color == Black():
+            key ^= SIDE_KEY
+        return key
     def get_square(self, file: chr, rank: str) -> Square:
         return self.squares[ord(file.lower()) - ord('a')][rank - 1]
     def get_rudimentary_eval(self) -> int:
-        eval = 0
-        for piece in self.white.pieces:
-            eval += piece.points
-        for piece in self.black.pieces:
-            eval -= piece.points
+        eval = self.material
         if self.check_check():
-            available_moves, _ = self.get_moves()
-            if not available_moves:
+            if not self.has_legal_move():
                 if self.player_to_move.color == Black():
                     return float("inf")
                 else:
                     return float("-inf")
         return eval
-    def make_moves(self, moves: List[str]) -> None:
-        for move in moves:
-            self.make_move(move)
-    def make_move(self, move: str, update: bool = True) -> None:
-        piece: Piece = self.board[ord(move[0].lower()) - ord('a')][ord(move[1]) - ord('1')]
+    def push(self, move: Move | int) -> None:
+        """
+            Makes the move, a Move or a packed move, in place and remembers enough to take it back with pop
+            Castling and en passant are taken from the move's flags, make_move sets them for string moves
+        """
+        if not isinstance(move, int):
+            move = move.packed
+        start = self.squares[move & 7][(move >> 3) & 7]
+        end = self.squares[(move >> 6) & 7][(move >> 9) & 7]
+        special = move >> 12
+        piece: Piece = self.board[start._file][start._rank]
+        if not piece.is_piece:
+            raise ChessError(f"No piece to move on {start.file}{start.rank}")
+        player = piece.player
+        opponent = self.waiting_player if player is self.player_to_move else self.player_to_move
+        captured_piece: Piece = self.board[end._file][end._rank]
+        if special == ENPASSANT:
+            captured_piece = self.board[end._file][start._rank]
+        record = MoveRecord(move, piece, captured_piece, None, None, None, None,
+                            (self.white.can_kingside_castle, self.white.can_queenside_castle, self.black.can_kingside_castle, self.black.can_queenside_castle),
+                            self._enpassant_available, self.half_moves, self.moves, self.zobrist_key,
+                            (self.material, self.middlegame_score, self.endgame_score, self.phase, self.pawn_key))
+        key = self.zobrist_key ^ CASTLING_KEYS[self.castling_rights] ^ SIDE_KEY
+        if self._enpassant_available != None:
+            key ^= ENPASSANT_KEYS[self._enpassant_available._file]
+        key ^= PIECE_KEYS[piece.zobrist_index][start.index] ^ PIECE_KEYS[piece.zobrist_index][end.index]
+
+        changed = (1 << start.index) | (1 << end.index)
+        self._score_piece(piece, start.index, -1)
+        self._score_piece(piece, end.index, 1)
+        if captured_piece.is_piece:
+            changed |= 1 << captured_piece.square.index
+            self._score_piece(captured_piece, captured_piece.square.index, -1)
+            key ^= PIECE_KEYS[captured_piece.zobrist_index][captured_piece.square.index]
+            record.captured_index = opponent.pieces.index(captured_piece)
+            del opponent.pieces[record.captured_index]
+            opponent.occupancy ^= 1 << captured_piece.square.index
+            self.board[captured_piece.square._file][captured_piece.square._rank] = self.no_pieces[captured_piece.square._file][captured_piece.square._rank]
+        player.occupancy ^= (1 << start.index) | (1 << end.index)
+        self.board[start._file][start._rank] = self.no_pieces[start._file][start._rank]
+        self.board[end._file][end._rank] = piece
+        piece.square = end
+
         if isinstance(piece, King):
-            if move == "e1g1":
-                self.make_move("h1f1", False)
-            elif move == "e1c1":
-                self.make_move("a1d1", False)
-            elif move == "e8g8":
-                self.make_move("h8f8", False)
-            elif move == "e8c8":
-                self.make_move("a8d8", False)
-            if piece.is_black:
-                self.black.can_kingside_castle = False
-                self.black.can_queenside_castle = False
-            else:
+            player.can_kingside_castle = False
+            player.can_queenside_castle = False
+            if special == KINGSIDE_CASTLE:
+                record.rook = self.board[7][start._rank]
+            elif special == QUEENSIDE_CASTLE:
+                record.rook = self.board[0][start._rank]
+            if record.rook != None:
+                rook_file = (start._file + end._file) // 2
+                self.board[record.rook.square._file][start._rank] = self.no_pieces[record.rook.square._file][start._rank]
+                self.board[rook_file][start._rank] = record.rook
+                changed |= (1 << record.rook.square.index) | (1 << self.squares[rook_file][start._rank].index)
+                player.occupancy ^= (1 << record.rook.square.index) | (1 << self.squares[rook_file][start._rank].index)
+                key ^= PIECE_KEYS[record.rook.zobrist_index][record.rook.square.index] ^ PIECE_KEYS[record.rook.zobrist_index][self.squares[rook_file][start._rank].index]
+                self._score_piece(record.rook, record.rook.square.index, -1)
+                self._score_piece(record.rook, self.squares[rook_file][start._rank].index, 1)
+                record.rook.square = self.squares[rook_file][start._rank]
+        for square in (start, end):
+            if square._file == 7 and square._rank == 0:
                 self.white.can_kingside_castle = False
+            elif square._file == 0 and square._rank == 0:
                 self.white.can_queenside_castle = False
-        if move[:2] == "h1":
-            self.white.can_kingside_castle = False
-        elif move[:2] == "h8":
-            self.black.can_kingside_castle = False
-        elif move[:2] == "a1":
-            self.white.can_queenside_castle = False
-        elif move[:2] == "a8":
-            self.black.can_queenside_castle = False
-        attacked_piece = self.board[ord(move[2].lower()) - ord('a')][ord(move[3]) - ord('1')]
-        if attacked_piece.is_black:
-            self.black.remove_piece(attacked_piece)
-        elif attacked_piece.is_white:
-            self.white.remove_piece(attacked_piece)
-        NoPiece(self.squares[ord(move[0].lower()) - ord('a')][ord(move[1]) - ord('1')], self)
-        self.board[ord(move[2].lower()) - ord('a')][ord(move[3]) - ord('1')] = piece
-        piece.square = self.squares[ord(move[2].lower()) - ord('a')][ord(move[3]) - ord('1')]
+            elif square._file == 7 and square._rank == 7:
+                self.black.can_kingside_castle = False
+            elif square._file == 0 and square._rank == 7:
+                self.black.can_queenside_castle = False
+
+        self._enpassant_available = None
         if isinstance(piece, Pawn):
-            if piece.color == White():
-                direction = -1
-            else:
-                direction = 1
-            attacked_piece = self.board[piece.square._file][int(str(move[3])) + direction - 1]
-            enpassant_square = self.squares[piece.square._file][piece.square._rank]
-            if (self.enpassant_available == enpassant_square):
-                if attacked_piece.is_black:
-                    self.black.remove_piece(attacked_piece)
-                else:
-                    self.white.remove_piece(attacked_piece)
-                NoPiece(attacked_piece.square, self)
-            if (move[1] == '2' and move[3] == '4'):
-                self._enpassant_available = Square.new_square(move[2], 3)
-            elif (move[1] == '7' and move[3] == '5'):
-                self._enpassant_available = Square.new_square(move[2], 6)
-            else:
-                self._enpassant_available = None
-            if (piece.is_black and move[3] == '1') or (piece.is_white and move[3] == '8'):
-                if piece.is_black:
-                    self.black.remove_piece(piece)
-                else:
-                    self.white.remove_piece(piece)
-                color = piece.color
-                match move[4]:
-                    case 'q':
-                        Queen(color, piece.square, self)
-                    case 'n':
-                        Knight(color, piece.square, self)
-                    case 'b':
-                        Bishop(color, piece.square, self)
-                    case 'r':
-                        Rook(color, piece.square, self)
+            if abs(end._rank - start._rank) == 2:
+                self._enpassant_available = self.squares[start._file][(start._rank + end._rank) // 2]
+            elif end._rank == 7 or end._rank == 0:
+                record.pawn_index = player.pieces.index(piece)
+                del player.pieces[record.pawn_index]
+                self._score_piece(piece, end.index, -1)
+                promotion_piece = (Knight, Bishop, Rook, Queen)[special - PROMOTION] if special >= PROMOTION else Queen
+                record.promoted_piece = promotion_piece(piece.color, end, self)
+                key ^= PIECE_KEYS[piece.zobrist_index][end.index] ^ PIECE_KEYS[record.promoted_piece.zobrist_index][end.index]
+        if record.promoted_piece != None:
+            self._update_attacks(changed, (captured_piece, piece), (record.promoted_piece,))
         else:
-            self._enpassant_available = None
-        if update:
-            temp = self.player_to_move
-            self.player_to_move = self.waiting_player
-            self.waiting_player = temp
-        
+            self._update_attacks(changed, (captured_piece,), (piece, record.rook))
+        key ^= CASTLING_KEYS[self.castling_rights]
+        if self._enpassant_available != None:
+            key ^= ENPASSANT_KEYS[self._enpassant_available._file]
+        self.zobrist_key = key
+
+        if isinstance(piece, Pawn) or captured_piece.is_piece:
+            self.half_moves = 0
+        else:
+            self.half_moves += 1
+        if piece.is_black:
+            self.moves += 1
+        self.move_stack.append(record)
+        temp = self.player_to_move
+        self.player_to_move = self.waiting_player
+        self.waiting_player = temp
+    def pop(self) -> int:
+        """
+            Takes back the last move made with push or make_move
+            Returns: The packed move taken back
+        """
+        record = self.move_stack.pop()
+        temp = self.player_to_move
+        self.player_to_move = self.waiting_player
+        self.waiting_player = temp
+        move = record.move
+        start = self.squares[move & 7][(move >> 3) & 7]
+        end = self.squares[(move >> 6) & 7][(move >> 9) & 7]
+        piece = record.piece
+        player = piece.player
+
+        if self.accumulator != None:
+            self._undo_accumulator(record)
+        changed = (1 << start.index) | (1 << end.index)
+        if record.promoted_piece != None:
+            player.pieces.remove(record.promoted_piece)
+            player.pieces.insert(record.pawn_index, piece)
+        if record.rook != None:
+            rook_square = record.rook.square
+            self.board[rook_square._file][rook_square._rank] = self.no_pieces[rook_square._file][rook_square._rank]
+            rook_file = 7 if end._file > start._file else 0
+            self.board[rook_file][start._rank] = record.rook
+            player.occupancy ^= (1 << rook_square.index) | (1 << self.squares[rook_file][start._rank].index)
+            changed |= (1 << rook_square.index) | (1 << self.squares[rook_file][start._rank].index)
+            record.rook.square = self.squares[rook_file][start._rank]
+        self.board[end._file][end._rank] = self.no_pieces[end._file][end._rank]
+        self.board[start._file][start._rank] = piece
+        player.occupancy ^= (1 << start.index) | (1 << end.index)
+        piece.square = start
+        captured_piece = record.captured_piece
+        if captured_piece.is_piece:
+            captured_piece.player.pieces.insert(record.captured_index, captured_piece)
+            captured_piece.player.occupancy |= 1 << captured_piece.square.index
+            self.board[captured_piece.square._file][captured_piece.square._rank] = captured_piece
+            changed |= 1 << captured_piece.square.index
+        self._update_attacks(changed, (record.promoted_piece,) if record.promoted_piece != None else (), (piece, record.rook, captured_piece))
+
+        self.white.can_kingside_castle, self.white.can_queenside_castle, self.black.can_kingside_castle, self.black.can_queenside_castle = record.castling_rights
+        self._enpassant_available = record.enpassant_available
+        self.half_moves = record.half_moves
+        self.moves = record.moves
+        self.zobrist_key = record.zobrist_key
+        self.material, self.middlegame_score, self.endgame_score, self.phase, self.pawn_key = record.scores
+        return move
+    def _undo_accumulator(self, record: MoveRecord) -> None:
+        """
+            Takes back what push's _score_piece calls did to the accumulator, before pop puts the pieces back
+        """
+        accumulator = self.accumulator
+        start = record.move & 0x3F
+        end = (record.move >> 6) & 0x3F
+        moved = record.promoted_piece if record.promoted_piece != None else record.piece
+        accumulator.remove(moved.zobrist_index, end)
+        accumulator.add(record.piece.zobrist_index, start)
+        if record.rook != None:
+            accumulator.remove(record.rook.zobrist_index, record.rook.square.index)
+            accumulator.add(record.rook.zobrist_index, self.squares[7 if end > start else 0][start >> 3].index)
+        if record.captured_piece.is_piece:
+            accumulator.add(record.captured_piece.zobrist_index, record.captured_piece.square.index)
     def check_check(self, defendingSide: Color | None = None) -> bool:
-        attackSquares = [[0 for rank in range(8)] for file in range(8)]
-        attackingPlayer = self.waiting_player
         defendingPlayer = self.player_to_move
-
         if defendingSide == White():
-            attackingPlayer = self.black
             defendingPlayer = self.white
         elif defendingSide == Black():
-            attackingPlayer = self.white
             defendingPlayer = self.black
-
-        for piece in attackingPlayer.pieces:
-            attackSquares = piece.attack_squares_seen_int_arr(attackSquares)
-        if attackSquares[defendingPlayer.king.square._file][defendingPlayer.king.square._rank]:
-            return True
-        return False
+        return self.is_attacked(defendingPlayer.king.square.index, Black() if defendingPlayer is self.white else White())
+    def pawn_bitboards(self) -> tuple[int, int]:
+        pawns = [0, 0]
+        for player in (self.white, self.black):
+            for piece in player.pieces:
+                if piece.piece_type == Pawn.piece_type:
+                    pawns[piece.is_black] |= 1 << piece.square.index
+        return pawns[0], pawns[1]
+    def piece_codes(self) -> List[int]:
+        codes = [0] * 64
+        for player in (self.white, self.black):
+            for piece in player.pieces:
+                codes[piece.square.index] = piece.is_black * 6 + piece.piece_type + 1
+        return codes
+    def _piece_bitboards(self, player: Player) -> List[int]:
+        """
+            Returns: A bitboard per piece_type of player's pieces
+        """
+        bitboards = [0] * 6
+        for piece in player.pieces:
+            bitboards[piece.piece_type] |= 1 << piece.square.index
+        return bitboards
+    def checkers_and_pins(self, player: Player | None = None) -> tuple[int, dict[int, int]]:
+        """
+            Input: Defending player, the player to move by default
+            Returns: Bitboard of the pieces checking player's king, and player's absolutely pinned pieces by square index
+            mapped to the squares they may still move to
+        """
+        if player == None:
+            player = self.player_to_move
+        enemy = self._piece_bitboards(self.black if player is self.white else self.white)
+        king = player.king
+        return checkers_and_pins(king.square.index, int(king.is_black), player.occupancy, self.occupancy, enemy[0], enemy[1], enemy[2] | enemy[4], enemy[3] | enemy[4])
 
 
     @staticmethod
@@ -256,93 +842,186 @@ class ChessBoard:
         Pawn(White(), board.squares[1][1], board)
         Pawn(Black(), board.squares[0][6], board)
         Pawn(White(), board.squares[0][1], board)
+        board.moves = 1
+        board.zobrist_key = board.compute_zobrist_key()
         return board
     def is_absolutely_pinned(self, piece: Piece) -> bool:
-        warnings.warn("ChessBoard.is_absolutely_pinned has not been fully implemented")
-    def get_moves(self) -> tuple[List[Move], List[ChessBoard]]:
-        chessboards = []
-        moves = []
-        for piece in self.player_to_move.pieces:
-            squares, pieceMoves, pieceChessboards = piece.available_moves()
-            chessboards += pieceChessboards
-            moves += pieceMoves
-        return moves, chessboards
-    def make_best_move_half_depth(self, halfdepth: int = 2, inplace: bool = True) -> tuple[Move, ChessBoard]:
-        moves, chessboards = self.get_moves()
-        evals = []
-        best_moves = []
-        best_chessboards = []
-        if self.player_to_move.color == White():
-            best_eval = float("-inf")
-        else:
-            best_eval = float("inf")
-
-        for index in range(len(chessboards)):
-            value = chessboards[index].make_best_move(False)
-            if isinstance(value, Color):
-                if isinstance(value, White):
-                    eval = float("inf")
-                elif isinstance(value, Black):
-                    eval = float("-inf")
-                else:
-                    eval = 0
-            else:
-                nextmove, nextchessboard = value
-                eval = nextchessboard.get_rudimentary_eval()
-            if (self.player_to_move.color == White() and best_eval < eval) or (self.player_to_move.color == Black() and best_eval > eval):
-                best_moves = [moves[index]]
-                best_chessboards = [chessboards[index]]
-                best_eval = eval
-            elif best_eval == eval:
-                best_moves.append(moves[index])
-                best_chessboards.append(chessboards[index])
-
-        index = random.randrange(len(best_chessboards))
-        if inplace:
-            self = best_chessboards[index]
-        return best_moves[index], best_chessboards[index]
-            
-
-
-
-    def make_best_move(self, inplace: bool = True) -> tuple[Move, ChessBoard] | Color:
-        moves, chessboards = self.get_moves()
-        if len(moves) == 0:
-            if self.check_check():
-                if self.player_to_move.color == White():
-                    return Black()
+        if not piece.is_piece:
+            return False
+        return piece.square.index in self.checkers_and_pins(piece.player)[1]
+    def _legality(self) -> tuple[King, int, dict[int, int], int]:
+        """
+            Returns: The king of the side to move, the checkers and pins from checkers_and_pins,
+            and the squares the opponent attacks with the king lifted off the board
+        """
+        player = self.player_to_move
+        king = player.king
+        king_index = king.square.index
+        occupancy = self.occupancy
+        enemy = self._piece_bitboards(self.waiting_player)
+        diagonal = enemy[2] | enemy[4]
+        orthogonal = enemy[3] | enemy[4]
+        checkers, pins = checkers_and_pins(king_index, int(king.is_black), player.occupancy, occupancy, enemy[0], enemy[1], diagonal, orthogonal)
+        attacked = self.attack_maps[king.is_white]
+        # A slider giving check also attacks the squares behind the king on its ray
+        for checker in squares_of(checkers & (diagonal | orthogonal)):
+            attacked |= self.board[checker & 7][checker >> 3].attack_bitboard(occupancy ^ (1 << king_index))
+        return king, checkers, pins, attacked
+    def legal_moves(self) -> List[Move]:
+        return list(self.iter_moves())
+    def iter_moves(self) -> Iterator[Move]:
+        """
+            Legality comes from the checker and pin masks of one scan out of the king rather than making each move,
+            only en passant, which can uncover the king along the rank, is still made and tested
+            The moves are generated a piece at a time as they are consumed
+        """
+        king, checkers, pins, attacked = self._legality()
+        buffer = array('H')
+        self._king_moves(buffer, attacked, not checkers, False)
+        for move in buffer:
+            yield self.to_move(move)
+        targets = check_mask(king.square.index, checkers)
+        if not targets:
+            return
+        for piece in list(self.player_to_move.pieces):
+            if piece is not king:
+                del buffer[:]
+                self._piece_moves(buffer, piece, pins.get(piece.square.index, FULL) & targets, False)
+                for move in buffer:
+                    yield self.to_move(move)
+    def generate_moves(self, buffer: array, captures_only: bool = False) -> array:
+        """
+            Writes the packed legal moves straight from the pieces' attack bitboards, no Move is made
+            captures_only: Only captures and promotions, see generate_captures
+        """
+        del buffer[:]
+        king, checkers, pins, attacked = self._legality()
+        self._king_moves(buffer, attacked, not checkers and not captures_only, captures_only)
+        targets = check_mask(king.square.index, checkers)
+        if targets:
+            for piece in self.player_to_move.pieces:
+                if piece is not king:
+                    self._piece_moves(buffer, piece, pins.get(piece.square.index, FULL) & targets, captures_only)
+        return buffer
+    def generate_captures(self, buffer: array) -> array:
+        return self.generate_moves(buffer, True)
+    def has_legal_move(self) -> bool:
+        """
+            Tries king moves, then captures of the checker, then everything else, stopping at the first legal move
+            Castling needs no look, it is only possible when the king can already step towards the rook
+        """
+        king, checkers, pins, attacked = self._legality()
+        player = self.player_to_move
+        if KING_ATTACKS[king.square.index] & ~player.occupancy & ~attacked:
+            return True
+        targets = check_mask(king.square.index, checkers)
+        if not targets:
+            return False
+        pieces = [piece for piece in player.pieces if piece is not king]
+        if checkers:
+            for piece in pieces:
+                if piece.attack_mask & checkers & pins.get(piece.square.index, FULL):
+                    return True
+        buffer = array('H')
+        for piece in pieces:
+            mask = pins.get(piece.square.index, FULL) & targets
+            if isinstance(piece, Pawn):
+                self._pawn_moves(buffer, piece, mask, False)
+                if buffer:
+                    return True
+            elif piece.attack_mask & ~player.occupancy & mask:
+                return True
+        return False
+    def legal_move_count(self) -> int:
+        """
+            Counts from the attack bitboards, only pawn moves are generated
+        """
+        king, checkers, pins, attacked = self._legality()
+        player = self.player_to_move
+        count = (KING_ATTACKS[king.square.index] & ~player.occupancy & ~attacked).bit_count()
+        if not checkers:
+            count += len(self._castling_moves(attacked))
+        targets = check_mask(king.square.index, checkers)
+        if targets:
+            buffer = array('H')
+            for piece in player.pieces:
+                if piece is king:
+                    continue
+                mask = pins.get(piece.square.index, FULL) & targets
+                if isinstance(piece, Pawn):
+                    self._pawn_moves(buffer, piece, mask, False)
                 else:
-                    return White()
+                    count += (piece.attack_mask & ~player.occupancy & mask).bit_count()
+            count += len(buffer)
+        return count
+    def _piece_moves(self, buffer: array, piece: Piece, targets: int, captures_only: bool) -> None:
+        """
+            Appends the packed moves of a piece other than the king that end on targets
+        """
+        if isinstance(piece, Pawn):
+            self._pawn_moves(buffer, piece, targets, captures_only)
+            return
+        allowed = self.waiting_player.occupancy if captures_only else ~self.player_to_move.occupancy
+        start = piece.square.index
+        for end in squares_of(piece.attack_mask & allowed & targets):
+            buffer.append(start | end << 6)
+    def _pawn_moves(self, buffer: array, pawn: Pawn, targets: int, captures_only: bool) -> None:
+        """
+            Appends the pawn's packed moves that end on targets, captures_only keeps captures and promotions
+            En passant ignores targets, it is made and tested as it can uncover the king along the rank
+        """
+        start = pawn.square.index
+        forward = -8 if pawn.is_black else 8
+        last_rank = 0 if pawn.is_black else 7
+        occupancy = self.occupancy
+        ends = PAWN_ATTACKS[pawn.is_black][start] & self.waiting_player.occupancy
+        one = start + forward
+        if not occupancy >> one & 1:
+            if not captures_only or one >> 3 == last_rank:
+                ends |= 1 << one
+            if not captures_only and start >> 3 == (6 if pawn.is_black else 1) and not occupancy >> (one + forward) & 1:
+                ends |= 1 << (one + forward)
+        for end in squares_of(ends & targets):
+            if end >> 3 == last_rank:
+                for piece_type in (Queen.piece_type, Rook.piece_type, Bishop.piece_type, Knight.piece_type):
+                    buffer.append(start | end << 6 | (PROMOTION + piece_type - 1) << 12)
             else:
-                return NoColor()
-        best_moves = []
-        best_chessboards = []
-        if self.player_to_move.color == White():
-            best_eval = float("-inf")
-            for index in range(len(chessboards)):
-                eval = chessboards[index].get_rudimentary_eval()
-                if eval > best_eval:
-                    best_eval = eval
-                    best_moves = [moves[index]]
-                    best_chessboards = [chessboards[index]]
-                elif eval == best_eval:
-                    best_moves.append(moves[index])
-                    best_chessboards.append(chessboards[index])
-        elif self.player_to_move.color == Black():
-            best_eval = float("inf")
-            for index in range(len(chessboards)):
-                eval = chessboards[index].get_rudimentary_eval()
-                if eval < best_eval:
-                    best_eval = eval
-                    best_moves = [moves[index]]
-                    best_chessboards = [chessboards[index]]
-                elif eval == best_eval:
-                    best_moves.append(moves[index])
-                    best_chessboards.append(chessboards[index])
-        index = random.randrange(len(best_moves))
-        if inplace:
-            self = best_chessboards[index]
-        return best_moves[index], best_chessboards[index]
+                buffer.append(start | end << 6)
+        enpassant = self._enpassant_available
+        if enpassant != None and PAWN_ATTACKS[pawn.is_black][start] >> enpassant.index & 1:
+            move = start | enpassant.index << 6 | ENPASSANT << 12
+            if self.is_legal(move):
+                buffer.append(move)
+    def _king_moves(self, buffer: array, attacked: int, castling: bool, captures_only: bool) -> None:
+        player = self.player_to_move
+        start = player.king.square.index
+        allowed = self.waiting_player.occupancy if captures_only else ~player.occupancy
+        for end in squares_of(KING_ATTACKS[start] & allowed & ~attacked):
+            buffer.append(start | end << 6)
+        if castling:
+            buffer.extend(self._castling_moves(attacked))
+    def _castling_moves(self, attacked: int) -> List[int]:
+        """
+            Returns: The packed castling moves, for when the king is not in check
+        """
+        player = self.player_to_move
+        start = player.king.square.index
+        moves = []
+        rank = start >> 3
+        occupancy = self.occupancy
+        if player.can_kingside_castle and not (occupancy | attacked) & (0b11 << (rank * 8 + 5)):
+            moves.append(pack_move(start, rank * 8 + 6, KINGSIDE_CASTLE))
+        if player.can_queenside_castle and not occupancy & (0b111 << (rank * 8 + 1)) and not attacked & (0b11 << (rank * 8 + 2)):
+            moves.append(pack_move(start, rank * 8 + 2, QUEENSIDE_CASTLE))
+        return moves
+    def legal_captures(self) -> List[Move]:
+        return [self.to_move(move) for move in self.generate_captures(array('H'))]
+    def piece_type_at(self, square: int) -> int:
+        """
+            Input: Square index, rank * 8 + file
+            Returns: piece_type of the piece on the square, -1 if it is empty
+        """
+        return self.board[square % 8][square // 8].piece_type
     @staticmethod
     def from_fen(fen: str) -> ChessBoard:
         board = ChessBoard()
@@ -423,7 +1102,7 @@ class ChessBoard:
         if fen[stringIndex] == '-':
             stringIndex += 2
         else:
-            board._enpassant_available = Square.new_square(fen[stringIndex], fen[stringIndex + 1])
+            board._enpassant_available = Square.new_square(fen[stringIndex], int(fen[stringIndex + 1]))
             stringIndex += 3
             
 
@@ -441,6 +1120,7 @@ class ChessBoard:
         board.moves = int("".join(digits))
         stringIndex += 1
 
+        board.zobrist_key = board.compute_zobrist_key()
         return board
 
         
@@ -457,7 +1137,7 @@ class ChessBoard:
                     noPieceCount += 1
                 elif isinstance(piece, King):
                     if noPieceCount != 0:
-                        fen += chr(noPieceCount)
+                        fen += str(noPieceCount)
                         noPieceCount = 0
                     if piece.is_black:
                         fen += 'k'
@@ -465,7 +1145,7 @@ class ChessBoard:
                         fen += 'K'
                 elif isinstance(piece, Queen):
                     if noPieceCount != 0:
-                        fen += chr(noPieceCount)
+                        fen += str(noPieceCount)
                         noPieceCount = 0
                     if piece.is_black:
                         fen += 'q'
@@ -473,7 +1153,7 @@ class ChessBoard:
                         fen += 'Q'
                 elif isinstance(piece, Bishop):
                     if noPieceCount != 0:
-                        fen += chr(noPieceCount)
+                        fen += str(noPieceCount)
                         noPieceCount = 0
                     if piece.is_black:
                         fen += 'b'
@@ -481,7 +1161,7 @@ class ChessBoard:
                         fen += 'B'
                 elif isinstance(piece, Rook):
                     if noPieceCount != 0:
-                        fen += chr(noPieceCount)
+                        fen += str(noPieceCount)
                         noPieceCount = 0
                     if piece.is_black:
                         fen += 'r'
@@ -489,7 +1169,7 @@ class ChessBoard:
                         fen += 'R'
                 elif isinstance(piece, Knight):
                     if noPieceCount != 0:
-                        fen += chr(noPieceCount)
+                        fen += str(noPieceCount)
                         noPieceCount = 0
                     if piece.is_black:
                         fen += 'n'
@@ -497,7 +1177,7 @@ class ChessBoard:
                         fen += 'N'
                 elif isinstance(piece, Pawn):
                     if noPieceCount != 0:
-                        fen += chr(noPieceCount)
+                        fen += str(noPieceCount)
                         noPieceCount = 0
                     if piece.is_black:
                         fen += 'p'
@@ -531,13 +1211,17 @@ class ChessBoard:
         else:
             fen += " -"
         if self.enpassant_available:
-            fen += " " + self.enpassant_available.file + self.enpassant_available.rank
+            fen += " " + self.enpassant_available.file + str(self.enpassant_available.rank)
         else:
             fen += " -"
-        fen += " " + chr(self.half_moves + ord('0')) + " " + chr(self.moves + ord('0'))
+        fen += " " + str(self.half_moves) + " " + str(self.moves)
         return fen
 
 class Piece:
+    # Pawn, knight, bishop, rook, queen, king = 0 to 5, matching Zobrist and Bitboards
+    piece_type = -1
+    # Whether the attack set depends on the occupancy of the board
+    is_slider = False
     def __init__(self, color: Color, square: Square, board: ChessBoard = None):
         self.color = color
         if (isinstance(color, NoColor)):
@@ -550,6 +1234,9 @@ class Piece:
             self.is_piece = True
         self.board = board
         self.square = square
+        self.zobrist_index = self.is_black * 6 + self.piece_type
+        # Attack bitboard counted in board.attack_counts, own pieces included
+        self.attack_mask = 0
         if (board != None):
             self.board.add_piece(self)
             if color == White():
@@ -560,6 +1247,18 @@ class Piece:
         return str(self.color) + " " + str(type(self)) + " on " + str(self.square.file) + str(self.square.rank)
     def attack_squares_seen_int_arr(self, squares_seen: List[List[int]] | None = None) -> List[List[int]]:
         raise NotImplementedError("Do not call func: attack_squares_seen_int, on base class: Piece")
+    def attack_bitboard(self, occupancy: int | None = None) -> int:
+        """
+            Input: occupancy: Blockers for sliders, the board's occupancy by default
+            Returns: Every square the piece attacks, squares of its own side included
+        """
+        raise NotImplementedError("Do not call func: attack_bitboard, on base class: Piece")
+    def _attacked_squares(self, attacks: int) -> List[int]:
+        """
+            Input: Attack bitboard from AttackTables
+            Returns: Square indexes it covers that are not occupied by our own pieces
+        """
+        return squares_of(attacks & ~self.player.occupancy)
     def is_opposite_color(self, color: Color) -> bool:
         if (isinstance(color, NoColor)):
             return self.is_piece
@@ -572,105 +1271,46 @@ class Piece:
         elif (isinstance(color, White)):
             return self.is_white
         return self.is_black
-    def available_moves(self) -> tuple[List[Square], List[ChessBoard]]:
-        raise NotImplementedError("Available moves not implemented on base class Piece")
+    def available_moves(self) -> tuple[List[Square], List[Move], List[ChessBoard]]:
+        available_moves = [move for move in self.board.legal_moves() if move.start_square == self.square]
+        available_squares = [move.end_square for move in available_moves]
+        chessboards = [self.board.child(move) for move in available_moves]
+        return available_squares, available_moves, chessboards
                     
 class NoPiece(Piece):
     points = 0
+    piece_type = -1
     def __init__(self, square, board = None):
         super().__init__(NoColor(), square, board)
         self.color = NoColor()
+    def attack_bitboard(self, occupancy: int | None = None) -> int:
+        return 0
 
 
 
 
 class King(Piece):
-    points = 0
+    piece_type = 5
+    points = POINTS[piece_type]
     def __init__(self, color, square, board = None):
         super().__init__(color, square, board)
+    def attack_bitboard(self, occupancy: int | None = None) -> int:
+        return KING_ATTACKS[self.square.index]
     def attack_squares_seen_int_arr(self, squares_seen: List[List[int]] | None) -> List[List[int]]:
         if not squares_seen:
             squares_seen = [[0 for rank in range(8)] for file in range(8)]
-        for rank in range(self.square._rank - 1, self.square._rank + 2):
-            if rank < 0 or rank >= 8:
+        for file, rank in KING_SQUARES[self.square.index]:
+            if self.board[file][rank].color == self.color:
                 continue
-            for file in range(self.square._file - 1, self.square._file + 2):
-                if file < 0 or file >= 8:
-                    continue
-                if self.board[file][rank].color == self.color:
-                    continue
-                #squares_seen.append(Square(file, rank))
-                squares_seen[file][rank] += 1
+            squares_seen[file][rank] += 1
         return squares_seen
     def attack_squares_seen(self) -> List[Square]:
         squares_seen = []
-        for rank in range(self.square._rank - 1, self.square._rank + 2):
-            if rank < 0 or rank >= 8:
+        for file, rank in KING_SQUARES[self.square.index]:
+            if self.board[file][rank].color == self.color:
                 continue
-            for file in range(self.square._file - 1, self.square._file + 2):
-                if file < 0 or file >= 8:
-                    continue
-                if self.board[file][rank].color == self.color:
-                    continue
-                #squares_seen.append(Square(file, rank))
-                squares_seen.append(self.board.squares[file][rank])
+            squares_seen.append(self.board.squares[file][rank])
         return squares_seen
-    def available_moves(self) -> tuple[List[Square], List[Move], List[ChessBoard]]:
-        chessboards = []
-        available_moves = []
-        available_squares = []
-        possible_end_squares = self.attack_squares_seen()
-        for square in possible_end_squares:
-            board = copy.deepcopy(self.board)
-            move = Move(self.square, square)
-            board.make_move(move.to_long_move())
-            if not board.check_check(self.color):
-                chessboards.append(board)
-                available_moves.append(move)
-                available_squares.append(square)
-        if self.player.can_kingside_castle:
-            if self.color == White():
-                attacked_squares = self.board.black.get_attack_squares_arr_int()
-                if not attacked_squares[5][0] and not attacked_squares[6][0]:
-                    if not self.board[5][0].is_piece and not self.board[6][0].is_piece:
-                        board = copy.deepcopy(self.board)
-                        move = Move(self.square, Square(6, 0))
-                        board.make_move(move.to_long_move())
-                        chessboards.append(board)
-                        available_moves.append(move)
-                        available_squares.append(Square(6, 0))
-            if self.color == Black():
-                attacked_squares = self.board.white.get_attack_squares_arr_int()
-                if not attacked_squares[5][7] and not attacked_squares[6][7]:
-                    if not self.board[5][7].is_piece and not self.board[6][7].is_piece:
-                        board = copy.deepcopy(self.board)
-                        move = Move(self.square, Square(6, 7))
-                        board.make_move(move.to_long_move())
-                        chessboards.append(board)
-                        available_moves.append(move)
-                        available_squares.append(Square(6, 7))
-        if self.player.can_queenside_castle:
-            if self.color == White():
-                attacked_squares = self.board.black.get_attack_squares_arr_int()
-                if not attacked_squares[3][0] and not attacked_squares[2][0]:
-                    if not self.board[3][0].is_piece and not self.board[2][0].is_piece and not self.board[1][0]:
-                        board = copy.deepcopy(self.board)
-                        move = Move(self.square, Square(2, 0))
-                        board.make_move(move.to_long_move())
-                        chessboards.append(board)
-                        available_moves.append(move)
-                        available_squares.append(Square(2, 0))
-            if self.color == Black():
-                attacked_squares = self.board.white.get_attack_squares_arr_int()
-                if not attacked_squares[3][7] and not attacked_squares[2][7]:
-                    if not self.board[3][7].is_piece and not self.board[2][7].is_piece and not self.board[1][7]:
-                        board = copy.deepcopy(self.board)
-                        move = Move(self.square, Square(2, 7))
-                        board.make_move(move.to_long_move())
-                        chessboards.append(board)
-                        available_moves.append(move)
-                        available_squares.append(Square(2, 7))
-        return available_squares, available_moves, chessboards
 
             
 
@@ -678,561 +1318,112 @@ class King(Piece):
 
 
 class Pawn(Piece):
-    points = 1
+    piece_type = 0
+    points = POINTS[piece_type]
     def __init__(self, color, square, board = None):
         super().__init__(color, square, board)
         self.is_first_move = True
+    def attack_bitboard(self, occupancy: int | None = None) -> int:
+        return PAWN_ATTACKS[self.is_black][self.square.index]
     def attack_squares_seen_int_arr(self, squares_seen: List[List[int]] | None) -> List[List[int]]:
         if not squares_seen:
             squares_seen = [[0 for rank in range(8)] for file in range(8)]
-        direction = -1
-        if self.color == White():
-            direction = 1
-        if self.square._file + 1 < 8:
-            if self.board[self.square._file + 1][self.square._rank + (direction)].is_opposite_color(self.color):
-                squares_seen[self.square._file + 1][self.square._rank + (direction)] += 1
-            if self.board.squares[self.square._file + 1][self.square._rank + (direction)] == self.board.enpassant_available:
-                squares_seen[self.square._file + 1][self.square._rank + (direction)] += 1
-        if self.square._file - 1 >= 0:
-            if self.board[self.square._file - 1][self.square._rank + (direction)].is_opposite_color(self.color):
-                squares_seen[self.square._file - 1][self.square._rank + (direction)] += 1
-            if self.board.squares[self.square._file - 1][self.square._rank + (direction)] == self.board.enpassant_available:
-                squares_seen[self.square._file - 1][self.square._rank + (direction)] += 1
+        for file, rank in PAWN_SQUARES[self.is_black][self.square.index]:
+            if self.board[file][rank].is_color(self.color):
+                continue
+            squares_seen[file][rank] += 1
         return squares_seen
     def attack_squares_seen(self) -> List[Square]:
         squares_seen = []
-        direction = -1
-        if self.color == White():
-            direction = 1
-        if self.square._file + 1 < 8:
-            if self.board[self.square._file + 1][self.square._rank + (direction)].is_opposite_color(self.color):
-                squares_seen.append(self.board.squares[self.square._file + 1][self.square._rank + (direction)])
-            if self.board.squares[self.square._file + 1][self.square._rank + (direction)] == self.board.enpassant_available:
-                squares_seen.append(self.board.squares[self.square._file + 1][self.square._rank + (direction)])
-        if self.square._file - 1 >= 0:
-            if self.board[self.square._file - 1][self.square._rank + (direction)].is_opposite_color(self.color):
-                squares_seen.append(self.board.squares[self.square._file - 1][self.square._rank + (direction)])
-            if self.board.squares[self.square._file - 1][self.square._rank + (direction)] == self.board.enpassant_available:
-                squares_seen.append(self.board.squares[self.square._file - 1][self.square._rank + (direction)])
+        for file, rank in PAWN_SQUARES[self.is_black][self.square.index]:
+            if self.board[file][rank].is_opposite_color(self.color):
+                squares_seen.append(self.board.squares[file][rank])
+            if self.board.squares[file][rank] == self.board.enpassant_available:
+                squares_seen.append(self.board.squares[file][rank])
         return squares_seen
 
-    
-
-
-    def available_moves(self) -> tuple[List[Square], List[Move], List[ChessBoard]]:
-        chessboards = []
-        available_squares = []
-        available_moves = []
-        possible_end_squares = self.attack_squares_seen()
-        def handle_promotions(end_square):
-            move = Move(self.square, end_square, promotion_piece=Queen)
-            board = copy.deepcopy(self.board)
-            board.make_move(move.to_long_move())
-            if not board.check_check(self.color):
-                available_squares.append(end_square)
-                chessboards.append(board)
-                available_moves.append(move)
-                move = Move(self.square, end_square, promotion_piece=Rook)
-                board = copy.deepcopy(self.board)
-                board.make_move(move.to_long_move())
-                chessboards.append(board)
-                available_moves.append(move)
-                move = Move(self.square, end_square, promotion_piece=Bishop)
-                board = copy.deepcopy(self.board)
-                board.make_move(move.to_long_move())
-                chessboards.append(board)
-                available_moves.append(move)
-                move = Move(self.square, end_square, promotion_piece=Knight)
-                board = copy.deepcopy(self.board)
-                board.make_move(move.to_long_move())
-                chessboards.append(board)
-                available_moves.append(move)
-
-        if self.color == White() and not self.board[self.square._file][self.square._rank + 1].is_piece:
-            if self.square._rank == 6:
-                end_square = Square(self.square._file, self.square._rank + 1)
-                handle_promotions(end_square)
-            else:
-                possible_end_squares.append(Square(self.square._file, self.square._rank + 1))
-            if self.square._rank == 1 and (not self.board[self.square._file][self.square._rank + 2].is_piece):  
-                possible_end_squares.append(Square(self.square._file, self.square._rank + 2))
-        if self.color == Black() and not self.board[self.square._file][self.square._rank - 1].is_piece:
-            if self.square._rank == 1:
-                end_square = Square(self.square._file, self.square._rank - 1)
-                handle_promotions(end_square)
-            else:
-                possible_end_squares.append(Square(self.square._file, self.square._rank - 1))
-            if self.square._rank == 6 and (not self.board[self.square._file][self.square._rank - 2].is_piece):
-                possible_end_squares.append(Square(self.square._file, self.square._rank - 2))
-        for square in possible_end_squares:
-            board = copy.deepcopy(self.board)
-            if (self.is_white and square.rank == 8) or (self.is_black and square.rank == 1):
-                handle_promotions(square)
-            else:
-                move = Move(self.square, square)
-                board.make_move(move.to_long_move())
-                if not board.check_check(self.color):
-                    chessboards.append(board)
-                    available_moves.append(move)
-                    available_squares.append(square)
-        return available_squares, available_moves, chessboards
         
 
         
 
 class Rook(Piece):
-    points = 5
+    piece_type = 3
+    points = POINTS[piece_type]
+    is_slider = True
     def __init__(self, color, square, board = None):
         super().__init__(color, square, board)
+    def attack_bitboard(self, occupancy: int | None = None) -> int:
+        return rook_attacks(self.square.index, self.board.occupancy if occupancy == None else occupancy)
 
-    def attack_squares_seen_int_arr(self, squares_seen: List[List[int]] | None) -> List[List[int]]:
+    def attack_squares_seen_int_arr(self, squares_seen: List[List[int]] | None = None) -> List[List[int]]:
         if not squares_seen:
             squares_seen = [[0 for rank in range(8)] for file in range(8)]
-        for increment in range(7):
-            if self.square._file + increment + 1 > 7:
-                break
-            piece: Piece = self.board[self.square._file + increment + 1][self.square._rank]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._file - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file - increment - 1][self.square._rank]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._rank + increment + 1 > 7:
-                break
-            piece = self.board[self.square._file][self.square._rank + increment + 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._rank - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file][self.square._rank - increment - 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
+        for square in self._attacked_squares(rook_attacks(self.square.index, self.board.occupancy)):
+            squares_seen[square & 7][square >> 3] += 1
         return squares_seen
     def attack_squares_seen(self) -> List[Square]:
-        squares_seen = []
-        for increment in range(7):
-            if self.square._file + increment + 1 > 7:
-                break
-            piece: Piece = self.board[self.square._file + increment + 1][self.square._rank]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._file - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file - increment - 1][self.square._rank]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._rank + increment + 1 > 7:
-                break
-            piece = self.board[self.square._file][self.square._rank + increment + 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._rank - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file][self.square._rank - increment - 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        return squares_seen
-    def available_moves(self) -> tuple[List[Square], List[Move], List[ChessBoard]]:
-        chessboards = []
-        available_moves = []
-        available_squares = []
-        possible_end_squares = self.attack_squares_seen()
-        for square in possible_end_squares:
-            board = copy.deepcopy(self.board)
-            move = Move(self.square, square)
-            board.make_move(move.to_long_move())
-            if not board.check_check(self.color):
-                chessboards.append(board)
-                available_moves.append(move)
-                available_squares.append(square)
-        return available_squares, available_moves, chessboards
+        return [self.board.squares[square & 7][square >> 3] for square in self._attacked_squares(rook_attacks(self.square.index, self.board.occupancy))]
 
 class Knight(Piece):
-    points = 3
+    piece_type = 1
+    points = POINTS[piece_type]
     def __init__(self, color, square, board = None):
         super().__init__(color, square, board)
+    def attack_bitboard(self, occupancy: int | None = None) -> int:
+        return KNIGHT_ATTACKS[self.square.index]
     def attack_squares_seen_int_arr(self, squares_seen: List[List[int]] | None) -> List[List[int]]:
         if not squares_seen:
             squares_seen = [[0 for rank in range(8)] for file in range(8)]
-        for rank_direction in [-1, 1]:
-            for file_direction in [-1, 1]:
-                for zig_or_zag in [(1, 2), (2, 1)]:
-                    new_file = self.square._file + (zig_or_zag[0] * file_direction)
-                    new_rank = self.square._rank + (zig_or_zag[1] * rank_direction)
-                    if new_file > 7 or new_file < 0:
-                        continue
-                    if new_rank > 7 or new_rank < 0:
-                        continue
-                    if self.board[new_file][new_rank].is_color(self.color):
-                        continue
-                    squares_seen[new_file][new_rank] += 1
+        for file, rank in KNIGHT_SQUARES[self.square.index]:
+            if self.board[file][rank].is_color(self.color):
+                continue
+            squares_seen[file][rank] += 1
         return squares_seen
     def attack_squares_seen(self) -> List[Square]:
         squares_seen = []
-        for rank_direction in [-1, 1]:
-            for file_direction in [-1, 1]:
-                for zig_or_zag in [(1, 2), (2, 1)]:
-                    new_file = self.square._file + (zig_or_zag[0] * file_direction)
-                    new_rank = self.square._rank + (zig_or_zag[1] * rank_direction)
-                    if new_file > 7 or new_file < 0:
-                        continue
-                    if new_rank > 7 or new_rank < 0:
-                        continue
-                    if self.board[new_file][new_rank].is_color(self.color):
-                        continue
-                    squares_seen.append(self.board.squares[new_file][new_rank])
+        for file, rank in KNIGHT_SQUARES[self.square.index]:
+            if self.board[file][rank].is_color(self.color):
+                continue
+            squares_seen.append(self.board.squares[file][rank])
         return squares_seen
-    def available_moves(self) -> tuple[List[Square], List[Move], List[ChessBoard]]:
-        chessboards = []
-        available_moves = []
-        available_squares = []
-        possible_end_squares = self.attack_squares_seen()
-        for square in possible_end_squares:
-            board = copy.deepcopy(self.board)
-            move = Move(self.square, square)
-            board.make_move(move.to_long_move())
-            if not board.check_check(self.color):
-                chessboards.append(board)
-                available_moves.append(move)
-                available_squares.append(square)
-        return available_squares, available_moves, chessboards
 
 class Queen(Piece):
-    points = 9
+    piece_type = 4
+    points = POINTS[piece_type]
+    is_slider = True
 
     def __init__(self, color, square, board = None):
         super().__init__(color, square, board)
-    def attack_squares_seen_int_arr(self, squares_seen: List[List[int]] | None) -> List[List[int]]:
+    def attack_bitboard(self, occupancy: int | None = None) -> int:
+        return queen_attacks(self.square.index, self.board.occupancy if occupancy == None else occupancy)
+    def attack_squares_seen_int_arr(self, squares_seen: List[List[int]] | None = None) -> List[List[int]]:
         if not squares_seen:
             squares_seen = [[0 for rank in range(8)] for file in range(8)]
-        for increment in range(7):
-            if self.square._file + increment + 1 > 7 or self.square._rank + increment + 1 > 7:
-                break
-            piece: Piece = self.board[self.square._file + increment + 1][self.square._rank + increment + 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._file + increment + 1 > 7 or self.square._rank - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file + increment + 1][self.square._rank - increment - 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._file - increment - 1 < 0 or self.square._rank - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file - increment - 1][self.square._rank - increment - 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._file - increment - 1 < 0 or self.square._rank + increment + 1 > 7:
-                break
-            piece = self.board[self.square._file - increment - 1][self.square._rank + increment + 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._file + increment + 1 > 7:
-                break
-            piece = self.board[self.square._file + increment + 1][self.square._rank]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._file - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file - increment - 1][self.square._rank]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._rank + increment + 1 > 7:
-                break
-            piece = self.board[self.square._file][self.square._rank + increment + 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._rank - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file][self.square._rank - increment - 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
+        for square in self._attacked_squares(queen_attacks(self.square.index, self.board.occupancy)):
+            squares_seen[square & 7][square >> 3] += 1
         return squares_seen
     def attack_squares_seen(self) -> List[Square]:
-        squares_seen = []
-        for increment in range(7):
-            if self.square._file + increment + 1 > 7 or self.square._rank + increment + 1 > 7:
-                break
-            piece = self.board[self.square._file + increment + 1][self.square._rank + increment + 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._file + increment + 1 > 7 or self.square._rank - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file + increment + 1][self.square._rank - increment - 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._file - increment - 1 < 0 or self.square._rank - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file - increment - 1][self.square._rank - increment - 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._file - increment - 1 < 0 or self.square._rank + increment + 1 > 7:
-                break
-            piece = self.board[self.square._file - increment - 1][self.square._rank + increment + 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._file + increment + 1 > 7:
-                break
-            piece = self.board[self.square._file + increment + 1][self.square._rank]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._file - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file - increment - 1][self.square._rank]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._rank + increment + 1 > 7:
-                break
-            piece = self.board[self.square._file][self.square._rank + increment + 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._rank - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file][self.square._rank - increment - 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        return squares_seen
-    def available_moves(self) -> tuple[List[Square], List[Move], List[ChessBoard]]:
-        chessboards = []
-        available_moves = []
-        available_squares = []
-        possible_end_squares = self.attack_squares_seen()
-        for square in possible_end_squares:
-            board = copy.deepcopy(self.board)
-            move = Move(self.square, square)
-            board.make_move(move.to_long_move())
-            if not board.check_check(self.color):
-                chessboards.append(board)
-                available_moves.append(move)
-                available_squares.append(square)
-        return available_squares, available_moves, chessboards
+        return [self.board.squares[square & 7][square >> 3] for square in self._attacked_squares(queen_attacks(self.square.index, self.board.occupancy))]
 
 class Bishop(Piece):
-    points = 3
+    piece_type = 2
+    points = POINTS[piece_type]
+    is_slider = True
 
     def __init__(self, color, square, board = None):
         super().__init__(color, square, board)
+    def attack_bitboard(self, occupancy: int | None = None) -> int:
+        return bishop_attacks(self.square.index, self.board.occupancy if occupancy == None else occupancy)
 
-    def attack_squares_seen_int_arr(self, squares_seen: List[int] | None = None) -> List[int]:
+    def attack_squares_seen_int_arr(self, squares_seen: List[List[int]] | None = None) -> List[List[int]]:
         if not squares_seen:
             squares_seen = [[0 for rank in range(8)] for file in range(8)]
-        for increment in range(7):
-            if self.square._file + increment + 1 > 7 or self.square._rank + increment + 1 > 7:
-                break
-            piece: Piece = self.board[self.square._file + increment + 1][self.square._rank + increment + 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._file + increment + 1 > 7 or self.square._rank - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file + increment + 1][self.square._rank - increment - 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._file - increment - 1 < 0 or self.square._rank - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file - increment - 1][self.square._rank - increment - 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
-        for increment in range(7):
-            if self.square._file - increment - 1 < 0 or self.square._rank + increment + 1 > 7:
-                break
-            piece = self.board[self.square._file - increment - 1][self.square._rank + increment + 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen[piece.square._file][piece.square._rank] += 1
-                break
-            squares_seen[piece.square._file][piece.square._rank] += 1
+        for square in self._attacked_squares(bishop_attacks(self.square.index, self.board.occupancy)):
+            squares_seen[square & 7][square >> 3] += 1
         return squares_seen
-        
     def attack_squares_seen(self) -> List[Square]:
-        squares_seen = []
-        for increment in range(7):
-            if self.square._file + increment + 1 > 7 or self.square._rank + increment + 1 > 7:
-                break
-            piece = self.board[self.square._file + increment + 1][self.square._rank + increment + 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._file + increment + 1 > 7 or self.square._rank - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file + increment + 1][self.square._rank - increment - 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._file - increment - 1 < 0 or self.square._rank - increment - 1 < 0:
-                break
-            piece = self.board[self.square._file - increment - 1][self.square._rank - increment - 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        for increment in range(7):
-            if self.square._file - increment - 1 < 0 or self.square._rank + increment + 1 > 7:
-                break
-            piece = self.board[self.square._file - increment - 1][self.square._rank + increment + 1]
-            if piece.is_color(self.color):
-                break
-            if piece.is_opposite_color(self.color):
-                squares_seen.append(piece.square)
-                break
-            squares_seen.append(piece.square)
-        return squares_seen
-    def available_moves(self) -> tuple[List[Square], List[Move], List[ChessBoard]]:
-        chessboards = []
-        available_moves = []
-        available_squares = []
-        possible_end_squares = self.attack_squares_seen()
-        for square in possible_end_squares:
-            board = copy.deepcopy(self.board)
-            move = Move(self.square, square)
-            board.make_move(move.to_long_move())
-            if not board.check_check(self.color):
-                chessboards.append(board)
-                available_moves.append(move)
-                available_squares.append(square)
-        return available_squares, available_moves, chessboards
-    
+        return [self.board.squares[square & 7][square >> 3] for square in self._attacked_squares(bishop_attacks(self.square.index, self.board.occupancy))]
+
 class Color:
     def __init__(self, is_white = True, is_black = False, is_piece = True):
         self.is_white = is_white
@@ -1286,10 +1477,16 @@ class Player:
         self._is_in_rook_check = False
         self.color = color
         self.king = None
+        self.occupancy = 0
     def get_attack_squares_arr_int(self) -> List[List[int]]:
+        """
+            Returns: [file][rank] counts of the squares the pieces attack that are not occupied by their own side,
+            read from the attack bitboards the board keeps up to date
+        """
         attack_squares = [[0 for rank in range(8)] for file in range(8)]
         for piece in self.pieces:
-            attack_squares = piece.attack_squares_seen_int_arr(attack_squares)
+            for square in squares_of(piece.attack_mask & ~self.occupancy):
+                attack_squares[square & 7][square >> 3] += 1
         return attack_squares
     @property
     def is_in_check(self) -> bool:
@@ -2,7 +2,7 @@
 import pygame 
 from pygame import Rect, Surface, Color, image
 import io
-from ChessRules import ChessBoard, Pawn, Rook, Bishop, Knight, King, Queen, NoPiece, Piece
+from ChessRules import new_game, ChessBoard, Pawn, Rook, Bishop, Knight, King, Queen, NoPiece, Piece
 # from ChessBoard import ChessBoard
 # from Pieces import Pawn, Rook, Bishop, Knight, King, Queen, NoPiece, Piece
 from stockfish import Stockfish
@@ -60,6 +60,8 @@ chess_board = ChessBoard.create_starting_board()
 print(f'{chess_board.check_check() = }')
 
 skill_level = 3
+# Seconds our engine may think per move
+engine_think_time = 10
 engine = chess.engine.SimpleEngine.popen_uci("C:\\Program Files\\komodo-14\\komodo")
 engine.configure({"Skill" : skill_level})
 board: chess.Board = chess.Board()
@@ -158,8 +160,11 @@ def make_move(move):
         draw()
         
         #result = engine.play(board, chess.engine.Limit(time = 10))
-        move, chess_board = chess_board.make_best_move_half_depth()
-        stockfish.make_moves_from_current_position([move.to_long_move()])
+        result = chess_board.make_best_move_in_time(engine_think_time)
+        # The game is already over when result is the winner instead of a move
+        if isinstance(result, tuple):
+            move, chess_board = result
+            stockfish.make_moves_from_current_position([move.to_long_move()])
         #board.push(chess.Move(chess.Square()))
         #chess_board.make_move(result.move.uci())
         piece_selected = None
@@ -256,6 +261,7 @@ def reset_game():
     global board
     global chess_board
     global stockfish
+    new_game()
     chess_board = ChessBoard.create_starting_board()
     board = chess.Board()
     stockfish.set_position()
@@ -317,7 +323,11 @@ def print_stats():
 def my_engine_make_move():
     global chess_board
     global board
-    move, chess_board = chess_board.make_best_move()
+    result = chess_board.make_best_move_in_time(engine_think_time)
+    if not isinstance(result, tuple):
+        # The game is already over, result is the winner
+        return
+    move, chess_board = result
     stockfish.make_moves_from_current_position([move.to_long_move()])
     board.push_uci(move.to_long_move())
 
@@ -0,0 +1,244 @@
+from __future__ import annotations
+import json
+import os
+from typing import Any, List
+from AttackTables import WHITE, BLACK, FILE_A, PAWN_ATTACKS, squares_of
+
+# Written by TexelTuning, its values replace the defaults below at startup when the file exists
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "evaluation_weights.json")
+
+def load_weights(path: str = WEIGHTS_FILE) -> dict[str, Any]:
+    """
+        Returns: The weights in the file by name, empty if there is no such file
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+_weights = load_weights()
+
+# Indexed by piece_type: pawn, knight, bishop, rook, queen, king
+# Rudimentary material in pawns, what get_rudimentary_eval counts and Piece.points reads
+POINTS = _weights.get("points", [1, 3, 3, 5, 9, 0])
+# Material in centipawns for the middlegame and the endgame
+MIDDLEGAME_VALUES = _weights.get("middlegame_values", [82, 337, 365, 477, 1025, 0])
+ENDGAME_VALUES = _weights.get("endgame_values", [94, 281, 297, 512, 936, 0])
+# How much each piece moves the game towards the middlegame, the starting position adds up to MAX_PHASE
+PHASE_WEIGHTS = [0, 1, 1, 2, 4, 0]
+MAX_PHASE = 24
+
+# Piece-square bonuses in centipawns for white, written the way the board looks from white: rank 8 first, a to h
+MIDDLEGAME_PST = _weights.get("middlegame_pst", [
+    [
+          0,   0,   0,   0,   0,   0,   0,   0,
+         98, 134,  61,  95,  68, 126,  34, -11,
+         -6,   7,  26,  31,  65,  56,  25, -20,
+        -14,  13,   6,  21,  23,  12,  17, -23,
+        -27,  -2,  -5,  12,  17,   6,  10, -25,
+        -26,  -4,  -4, -10,   3,   3,  33, -12,
+        -35,  -1, -20, -23, -15,  24,  38, -22,
+          0,   0,   0,   0,   0,   0,   0,   0,
+    ],
+    [
+        -167, -89, -34, -49,  61, -97, -15, -107,
+         -73, -41,  72,  36,  23,  62,   7,  -17,
+         -47,  60,  37,  65,  84, 129,  73,   44,
+          -9,  17,  19,  53,  37,  69,  18,   22,
+         -13,   4,  16,  13,  28,  19,  21,   -8,
+         -23,  -9,  12,  10,  19,  17,  25,  -16,
+         -29, -53, -12,  -3,  -1,  18, -14,  -19,
+        -105, -21, -58, -33, -17, -28, -19,  -23,
+    ],
+    [
+        -29,   4, -82, -37, -25, -42,   7,  -8,
+        -26,  16, -18, -13,  30,  59,  18, -47,
+        -16,  37,  43,  40,  35,  50,  37,  -2,
+         -4,   5,  19,  50,  37,  37,   7,  -2,
+         -6,  13,  13,  26,  34,  12,  10,   4,
+          0,  15,  15,  15,  14,  27,  18,  10,
+          4,  15,  16,   0,   7,  21,  33,   1,
+        -33,  -3, -14, -21, -13, -12, -39, -21,
+    ],
+    [
+         32,  42,  32,  51,  63,   9,  31,  43,
+         27,  32,  58,  62,  80,  67,  26,  44,
+         -5,  19,  26,  36,  17,  45,  61,  16,
+        -24, -11,   7,  26,  24,  35,  -8, -20,
+        -36, -26, -12,  -1,   9,  -7,   6, -23,
+        -45, -25, -16, -17,   3,   0,  -5, -33,
+        -44, -16, -20,  -9,  -1,  11,  -6, -71,
+        -19, -13,   1,  17,  16,   7, -37, -26,
+    ],
+    [
+        -28,   0,  29,  12,  59,  44,  43,  45,
+        -24, -39,  -5,   1, -16,  57,  28,  54,
+        -13, -17,   7,   8,  29,  56,  47,  57,
+        -27, -27, -16, -16,  -1,  17,  -2,   1,
+         -9, -26,  -9, -10,  -2,  -4,   3,  -3,
+        -14,   2, -11,  -2,  -5,   2,  14,   5,
+        -35,  -8,  11,   2,   8,  15,  -3,   1,
+         -1, -18,  -9,  10, -15, -25, -31, -50,
+    ],
+    [
+        -65,  23,  16, -15, -56, -34,   2,  13,
+         29,  -1, -20,  -7,  -8,  -4, -38, -29,
+         -9,  24,   2, -16, -20,   6,  22, -22,
+        -17, -20, -12, -27, -30, -25, -14, -36,
+        -49,  -1, -27, -39, -46, -44, -33, -51,
+        -14, -14, -22, -46, -44, -30, -15, -27,
+          1,   7,  -8, -64, -43, -16,   9,   8,
+        -15,  36,  12, -54,   8, -28,  24,  14,
+    ],
+])
+ENDGAME_PST = _weights.get("endgame_pst", [
+    [
+          0,   0,   0,   0,   0,   0,   0,   0,
+        178, 173, 158, 134, 147, 132, 165, 187,
+         94, 100,  85,  67,  56,  53,  82,  84,
+         32,  24,  13,   5,  -2,   4,  17,  17,
+         13,   9,  -3,  -7,  -7,  -8,   3,  -1,
+          4,   7,  -6,   1,   0,  -5,  -1,  -8,
+         13,   8,   8,  10,  13,   0,   2,  -7,
+          0,   0,   0,   0,   0,   0,   0,   0,
+    ],
+    [
+        -58, -38, -13, -28, -31, -27, -63, -99,
+        -25,  -8, -25,  -2,  -9, -25, -24, -52,
+        -24, -20,  10,   9,  -1,  -9, -19, -41,
+        -17,   3,  22,  22,  22,  11,   8, -18,
+        -18,  -6,  16,  25,  16,  17,   4, -18,
+        -23,  -3,  -1,  15,  10,  -3, -20, -22,
+        -42, -20, -10,  -5,  -2, -20, -23, -44,
+        -29, -51, -23, -15, -22, -18, -50, -64,
+    ],
+    [
+        -14, -21, -11,  -8,  -7,  -9, -17, -24,
+         -8,  -4,   7, -12,  -3, -13,  -4, -14,
+          2,  -8,   0,  -1,  -2,   6,   0,   4,
+         -3,   9,  12,   9,  14,  10,   3,   2,
+         -6,   3,  13,  19,   7,  10,  -3,  -9,
+        -12,  -3,   8,  10,  13,   3,  -7, -15,
+        -14, -18,  -7,  -1,   4,  -9, -15, -27,
+        -23,  -9, -23,  -5,  -9, -16,  -5, -17,
+    ],
+    [
+         13,  10,  18,  15,  12,  12,   8,   5,
+         11,  13,  13,  11,  -3,   3,   8,   3,
+          7,   7,   7,   5,   4,  -3,  -5,  -3,
+          4,   3,  13,   1,   2,   1,  -1,   2,
+          3,   5,   8,   4,  -5,  -6,  -8, -11,
+         -4,   0,  -5,  -1,  -7, -12,  -8, -16,
+         -6,  -6,   0,   2,  -9,  -9, -11,  -3,
+         -9,   2,   3,  -1,  -5, -13,   4, -20,
+    ],
+    [
+         -9,  22,  22,  27,  27,  19,  10,  20,
+        -17,  20,  32,  41,  58,  25,  30,   0,
+        -20,   6,   9,  49,  47,  35,  19,   9,
+          3,  22,  24,  45,  57,  40,  57,  36,
+        -18,  28,  19,  47,  31,  34,  39,  23,
+        -16, -27,  15,   6,   9,  17,  10,   5,
+        -22, -23, -30, -16, -16, -23, -36, -32,
+        -33, -28, -22, -43,  -5, -32, -20, -41,
+    ],
+    [
+        -74, -35, -18, -18, -11,  15,   4, -17,
+        -12,  17,  14,  17,  17,  38,  23,  11,
+         10,  17,  23,  15,  20,  45,  44,  13,
+         -8,  22,  24,  27,  26,  33,  26,   3,
+        -18,  -4,  21,  24,  27,  23,   9, -11,
+        -19,  -3,  11,  21,  23,  16,   7,  -9,
+        -27, -11,   4,  13,  14,   4,  -5, -17,
+        -53, -34, -21, -11, -28, -14, -24, -43,
+    ],
+])
+
+def _piece_tables(values: List[int], pst: List[List[int]]) -> List[List[int]]:
+    """
+        Returns: [color * 6 + piece_type][square index] value plus bonus, negative for black so a board can just add them up
+    """
+    tables = []
+    for color in range(2):
+        for piece_type in range(6):
+            # White's square index is mirrored onto the rank 8 first layout, black's mirror cancels that out
+            tables.append([(-1 if color else 1) * (values[piece_type] + pst[piece_type][square if color else square ^ 56]) for square in range(64)])
+    return tables
+
+# Indexed [color * 6 + piece_type][square index] like Zobrist.PIECE_KEYS, the boards keep the sums of these up to date as pieces come and go
+MIDDLEGAME_TABLES: List[List[int]] = _piece_tables(MIDDLEGAME_VALUES, MIDDLEGAME_PST)
+ENDGAME_TABLES: List[List[int]] = _piece_tables(ENDGAME_VALUES, ENDGAME_PST)
+# Indexed [color * 6 + piece_type]
+MATERIAL: List[int] = [(-1 if piece >= 6 else 1) * POINTS[piece % 6] for piece in range(12)]
+PHASES: List[int] = [PHASE_WEIGHTS[piece % 6] for piece in range(12)]
+
+def tapered(middlegame: int, endgame: int, phase: int) -> int:
+    """
+        Input: phase: Sum of PHASE_WEIGHTS on the board, more than MAX_PHASE after promotions counts as MAX_PHASE
+        Returns: The middlegame and endgame scores blended by how much material is left
+    """
+    phase = min(phase, MAX_PHASE)
+    return (middlegame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+
+# Pawn structure terms in centipawns, (middlegame, endgame)
+DOUBLED_PAWN = _weights.get("doubled_pawn", (-10, -20))
+ISOLATED_PAWN = _weights.get("isolated_pawn", (-10, -15))
+BACKWARD_PAWN = _weights.get("backward_pawn", (-8, -10))
+# Indexed by the rank counted from the pawn's own side, 0 to 7
+PASSED_PAWN = _weights.get("passed_pawn", [(0, 0), (5, 10), (10, 15), (15, 30), (25, 55), (45, 95), (70, 145), (0, 0)])
+# In the order pawn_counts counts them
+PAWN_TERMS = [DOUBLED_PAWN, ISOLATED_PAWN, BACKWARD_PAWN] + PASSED_PAWN
+
+FILE_MASKS: List[int] = [FILE_A << file for file in range(8)]
+ADJACENT_FILE_MASKS: List[int] = [(FILE_MASKS[file - 1] if file > 0 else 0) | (FILE_MASKS[file + 1] if file < 7 else 0) for file in range(8)]
+
+def _ranks_ahead(color: int, rank: int) -> int:
+    mask = 0
+    for ahead in (range(rank + 1, 8) if color == WHITE else range(rank)):
+        mask |= 0xFF << (ahead * 8)
+    return mask
+
+# Indexed [color][square index]
+# Squares an enemy pawn would have to stand on to stop or capture the pawn on its way forward
+PASSED_PAWN_MASKS: List[List[int]] = [[_ranks_ahead(color, square >> 3) & (FILE_MASKS[square & 7] | ADJACENT_FILE_MASKS[square & 7]) for square in range(64)] for color in (WHITE, BLACK)]
+# Squares on the adjacent files from which a friendly pawn could still come up to defend the pawn
+SUPPORT_MASKS: List[List[int]] = [[~_ranks_ahead(color, square >> 3) & ADJACENT_FILE_MASKS[square & 7] & 0xFFFFFFFFFFFFFFFF for square in range(64)] for color in (WHITE, BLACK)]
+
+def pawn_counts(white_pawns: int, black_pawns: int) -> tuple[List[int], int, int]:
+    """
+        Counts doubled, isolated, backward and passed pawns, which depend on nothing but where the pawns stand
+        Returns: White's count minus black's of each of PAWN_TERMS (passed pawns by rank), then the passed pawns of white and of black
+    """
+    pawns = [white_pawns, black_pawns]
+    counts = [0] * len(PAWN_TERMS)
+    passed = [0, 0]
+    for color in (WHITE, BLACK):
+        own = pawns[color]
+        enemy = pawns[color ^ 1]
+        sign = 1 if color == WHITE else -1
+        for file in range(8):
+            extra = (own & FILE_MASKS[file]).bit_count() - 1
+            if extra > 0:
+                counts[0] += sign * extra
+        for square in squares_of(own):
+            if not own & ADJACENT_FILE_MASKS[square & 7]:
+                counts[1] += sign
+            elif not own & SUPPORT_MASKS[color][square] and PAWN_ATTACKS[color][square + (8 if color == WHITE else -8)] & enemy:
+                counts[2] += sign
+            if not enemy & PASSED_PAWN_MASKS[color][square]:
+                passed[color] |= 1 << square
+                counts[3 + (square >> 3 if color == WHITE else 7 - (square >> 3))] += sign
+    return counts, passed[WHITE], passed[BLACK]
+
+def pawn_structure(white_pawns: int, black_pawns: int) -> tuple[int, int, int, int]:
+    """
+        Returns: Middlegame score, endgame score, both positive for white, then the passed pawns of white and of black
+    """
+    counts, white_passed, black_passed = pawn_counts(white_pawns, black_pawns)
+    middlegame = 0
+    endgame = 0
+    for count, term in zip(counts, PAWN_TERMS):
+        if count:
+            middlegame += count * term[0]
+            endgame += count * term[1]
+    return middlegame, endgame, white_passed, black_passed
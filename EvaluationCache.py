@@ -0,0 +1,111 @@
+from __future__ import annotations
+from array import array
+from typing import TYPE_CHECKING
+from Evaluation import pawn_structure
+if TYPE_CHECKING:
+    from ChessRules import BaseChessBoard
+
+# Each entry is one 64 bit word: the top 32 bits of the Zobrist key, then score + SCORE_OFFSET in the low 32 bits
+# The entry index comes from the low bits of the key, so together they check most of the key
+ENTRY_BYTES = 8
+SCORE_OFFSET = 1 << 31
+KEY_MASK = 0xFFFFFFFF00000000
+
+class EvaluationCache:
+    """
+        Fixed size, direct-mapped table of static evaluations keyed by Zobrist key, a new entry always replaces the old one
+        Sits in front of board.static_eval, whatever terms that grows to include
+    """
+    def __init__(self, size_mb: float = 4):
+        entries = max(int(size_mb * 1024 * 1024) // ENTRY_BYTES, 1)
+        # Round down to a power of two so the index is a mask
+        self.entry_count = 1 << (entries.bit_length() - 1)
+        self.mask = self.entry_count - 1
+        self.table = array('Q', bytes(self.entry_count * ENTRY_BYTES))
+        self.hits = 0
+        self.misses = 0
+    @property
+    def size_mb(self) -> float:
+        return self.entry_count * ENTRY_BYTES / (1024 * 1024)
+    @property
+    def hit_rate(self) -> float:
+        if self.hits + self.misses == 0:
+            return 0.0
+        return self.hits / (self.hits + self.misses)
+    def clear(self) -> None:
+        """
+            Empties the cache and resets the counters, for a new game
+        """
+        self.table = array('Q', bytes(self.entry_count * ENTRY_BYTES))
+        self.hits = 0
+        self.misses = 0
+    def probe(self, key: int) -> int | None:
+        """
+            Returns: The score stored for the key, None if it is not in the cache
+        """
+        entry = self.table[key & self.mask]
+        if entry and entry & KEY_MASK == key & KEY_MASK:
+            self.hits += 1
+            return (entry & 0xFFFFFFFF) - SCORE_OFFSET
+        self.misses += 1
+        return None
+    def store(self, key: int, score: int) -> None:
+        self.table[key & self.mask] = (key & KEY_MASK) | (score + SCORE_OFFSET)
+    def evaluate(self, board: BaseChessBoard) -> int:
+        """
+            Returns: board.static_eval(), from the cache when this position was evaluated before
+        """
+        key = board.zobrist_key
+        score = self.probe(key)
+        if score == None:
+            score = board.static_eval()
+            self.store(key, score)
+        return score
+
+# A pawn entry is four 64 bit words: the pawn key, the passed pawns of white, the passed pawns of black,
+# then middlegame + SCORE_OFFSET in the low 32 bits and endgame + SCORE_OFFSET in the high 32 bits
+PAWN_ENTRY_WORDS = 4
+
+class PawnHashTable:
+    """
+        Fixed size, direct-mapped table of pawn structure terms keyed by the pawn-only Zobrist key boards keep in pawn_key
+        Pawns move far less often than pieces, so nearly every evaluation finds its pawn structure here
+    """
+    def __init__(self, size_mb: float = 1):
+        entries = max(int(size_mb * 1024 * 1024) // (PAWN_ENTRY_WORDS * 8), 1)
+        self.entry_count = 1 << (entries.bit_length() - 1)
+        self.mask = self.entry_count - 1
+        self.table = array('Q', bytes(self.entry_count * PAWN_ENTRY_WORDS * 8))
+        self.hits = 0
+        self.misses = 0
+    @property
+    def size_mb(self) -> float:
+        return self.entry_count * PAWN_ENTRY_WORDS * 8 / (1024 * 1024)
+    @property
+    def hit_rate(self) -> float:
+        if self.hits + self.misses == 0:
+            return 0.0
+        return self.hits / (self.hits + self.misses)
+    def clear(self) -> None:
+        self.table = array('Q', bytes(self.entry_count * PAWN_ENTRY_WORDS * 8))
+        self.hits = 0
+        self.misses = 0
+    def evaluate(self, board: BaseChessBoard) -> tuple[int, int, int, int]:
+        """
+            Returns: Middlegame and endgame pawn structure scores, positive for white, and the passed pawns of white and of black
+        """
+        key = board.pawn_key
+        table = self.table
+        index = (key & self.mask) * PAWN_ENTRY_WORDS
+        scores = table[index + 3]
+        # Scores are stored with an offset so a used entry is never all zero
+        if scores and table[index] == key:
+            self.hits += 1
+            return (scores & 0xFFFFFFFF) - SCORE_OFFSET, (scores >> 32) - SCORE_OFFSET, table[index + 1], table[index + 2]
+        self.misses += 1
+        middlegame, endgame, white_passed, black_passed = pawn_structure(*board.pawn_bitboards())
+        table[index] = key
+        table[index + 1] = white_passed
+        table[index + 2] = black_passed
+        table[index + 3] = (middlegame + SCORE_OFFSET) | ((endgame + SCORE_OFFSET) << 32)
+        return middlegame, endgame, white_passed, black_passed
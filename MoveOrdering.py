@@ -0,0 +1,81 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Iterable, List
+from PackedMove import ENPASSANT, PROMOTION
+if TYPE_CHECKING:
+    from ChessRules import BaseChessBoard
+
+MAX_PLY = 128
+# Ordering score bands, highest first: hash move, captures and promotions, killers, then history for quiet moves
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 24
+KILLER_SCORE = 1 << 22
+# History scores are halved once any of them reaches this so they stay below the killers
+HISTORY_MAX = 1 << 20
+
+def mvv_lva(board: BaseChessBoard, move: int) -> int:
+    """
+        Input: Packed move
+        Returns: Most valuable victim first, then the best promotion, then the least valuable attacker
+    """
+    special = move >> 12
+    victim = 1 if special == ENPASSANT else board.piece_type_at((move >> 6) & 0x3F) + 1
+    promotion = special - PROMOTION + 1 if special >= PROMOTION else 0
+    return victim * 64 + promotion * 8 + 7 - board.piece_type_at(move & 0x3F)
+
+def is_quiet(board: BaseChessBoard, move: int) -> bool:
+    special = move >> 12
+    return special != ENPASSANT and special < PROMOTION and board.piece_type_at((move >> 6) & 0x3F) < 0
+
+class MoveOrderer:
+    """
+        Sorts moves so alpha-beta sees the likely best ones first
+        killers: Two quiet moves per ply that recently caused a beta cutoff, as packed moves
+        history: Butterfly table per color indexed by start square index | end square index << 6
+    """
+    def __init__(self):
+        self.killers: List[List[int]] = [[0, 0] for ply in range(MAX_PLY)]
+        self.history: List[List[int]] = [[0] * 4096 for color in range(2)]
+    def clear(self) -> None:
+        self.killers = [[0, 0] for ply in range(MAX_PLY)]
+        self.history = [[0] * 4096 for color in range(2)]
+    def new_search(self) -> None:
+        """
+            Forgets the killers and halves the history so the new position's cutoffs soon dominate
+        """
+        self.killers = [[0, 0] for ply in range(MAX_PLY)]
+        for history in self.history:
+            for index in range(4096):
+                history[index] >>= 1
+    def score(self, board: BaseChessBoard, move: int, ply: int, hash_move: int = 0) -> int:
+        if move == hash_move:
+            return HASH_MOVE_SCORE
+        if not is_quiet(board, move):
+            return CAPTURE_SCORE + mvv_lva(board, move)
+        killers = self.killers[ply]
+        if move == killers[0]:
+            return KILLER_SCORE + 1
+        if move == killers[1]:
+            return KILLER_SCORE
+        return self.history[board.color_to_move.is_black][move & 0xFFF]
+    def order(self, board: BaseChessBoard, moves: Iterable[int], ply: int, hash_move: int = 0) -> List[int]:
+        """
+            Input: Packed moves, hash_move: Packed best move from the transposition table, 0 if there is none
+            Returns: The moves sorted best first
+        """
+        return sorted(moves, key=lambda move: self.score(board, move, ply, hash_move), reverse=True)
+    def record_cutoff(self, board: BaseChessBoard, move: int, ply: int, depth: int) -> None:
+        """
+            Rewards a quiet move that failed high, captures are already ordered well by MVV-LVA
+        """
+        if not is_quiet(board, move):
+            return
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        history = self.history[board.color_to_move.is_black]
+        index = move & 0xFFF
+        history[index] += depth * depth
+        if history[index] >= HISTORY_MAX:
+            for square_pair in range(4096):
+                history[square_pair] >>= 1
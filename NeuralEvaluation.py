@@ -0,0 +1,124 @@
+from __future__ import annotations
+import os
+from typing import List
+import numpy as np
+
+# One input feature per (piece, square) as seen from each side: white sees the board as it is,
+# black sees it with the ranks flipped and the colors swapped, so both halves share one set of weights
+FEATURE_COUNT = 12 * 64
+# Quantisation of the weights file: feature weights and the accumulator are scaled by ACTIVATION_MAX, which the
+# clipped ReLU caps them at, output weights by OUTPUT_WEIGHT_SCALE, and the output by SCORE_SCALE to give centipawns
+ACTIVATION_MAX = 255
+OUTPUT_WEIGHT_SCALE = 64
+SCORE_SCALE = 400
+# Looked for next to the engine at startup
+DEFAULT_WEIGHTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nnue.npz")
+
+# Indexed [perspective][piece][square index], piece is color * 6 + piece_type as on BitboardChessBoard
+FEATURES: List[List[List[int]]] = [
+    [[piece * 64 + square for square in range(64)] for piece in range(12)],
+    [[(piece + 6) % 12 * 64 + (square ^ 56) for square in range(64)] for piece in range(12)]
+]
+# Rows of Network.signed_weights indexed [perspective][added 0 or removed 1][piece][square], piece -1 reads one of its zero rows
+_SIGNED_ROWS = np.array([[[[row + sign * (FEATURE_COUNT + 1) for row in rows] for rows in table + [[FEATURE_COUNT] * 64]] for sign in range(2)] for table in FEATURES], dtype=np.intp)
+# Which of a move's four features evaluate_children adds and which it removes
+_FEATURE_SIGNS = np.array([0, 0, 1, 1], dtype=np.intp)
+
+class Network:
+    """
+        Feature transformer (FEATURE_COUNT inputs to hidden_size per side) and one output neuron reading both sides,
+        side to move first, through a clipped ReLU
+        feature_weights: int16[FEATURE_COUNT, hidden_size], feature_bias: int16[hidden_size]
+        output_weights: int16[2 * hidden_size], output_bias: int32
+    """
+    def __init__(self, feature_weights: np.ndarray, feature_bias: np.ndarray, output_weights: np.ndarray, output_bias: int):
+        hidden_size = len(feature_bias)
+        if feature_weights.shape != (FEATURE_COUNT, hidden_size) or output_weights.shape != (2 * hidden_size,):
+            raise ValueError(f"Network layers do not fit together: {feature_weights.shape}, {feature_bias.shape}, {output_weights.shape}")
+        self.feature_weights = feature_weights.astype(np.int16)
+        self.feature_bias = feature_bias.astype(np.int16)
+        self.output_weights = output_weights.astype(np.int32)
+        self.output_bias = int(output_bias)
+        # For evaluate_children: the feature weights then the same negated for features taken away, each followed by a zero row for features left out
+        zero = np.zeros((1, hidden_size), dtype=np.int16)
+        self.signed_weights = np.vstack((self.feature_weights, zero, -self.feature_weights, zero))
+    def __deepcopy__(self, _memo):
+        # Weights never change once loaded, board copies share them
+        return self
+    @property
+    def hidden_size(self) -> int:
+        return len(self.feature_bias)
+    @staticmethod
+    def load(path: str) -> Network:
+        """
+            Input: path: .npz file with feature_weights, feature_bias, output_weights and output_bias arrays
+        """
+        with np.load(path) as weights:
+            return Network(weights["feature_weights"], weights["feature_bias"], weights["output_weights"], weights["output_bias"])
+    def save(self, path: str) -> None:
+        np.savez(path, feature_weights=self.feature_weights, feature_bias=self.feature_bias,
+                 output_weights=self.output_weights.astype(np.int16), output_bias=np.int32(self.output_bias))
+    def evaluate(self, accumulator: Accumulator, is_black: bool) -> int:
+        """
+            Input: is_black: Whether black is to move
+            Returns: Score in centipawns, positive favours white
+        """
+        values = accumulator.values
+        hidden = np.clip(np.concatenate((values[1], values[0]) if is_black else values), 0, ACTIVATION_MAX).astype(np.int32)
+        score = (int(hidden.reshape(-1) @ self.output_weights) + self.output_bias) * SCORE_SCALE // (ACTIVATION_MAX * OUTPUT_WEIGHT_SCALE)
+        return -score if is_black else score
+
+    def evaluate_children(self, accumulator: Accumulator, changes: List[tuple[int, ...]], is_black: bool) -> List[int]:
+        """
+            Scores the positions one move on from the accumulator's in one go, the moves are never made
+            Input: changes: Per move the piece and square of the two features it adds then the two it removes,
+                piece -1 for a feature left out, see BaseChessBoard.feature_changes
+                is_black: Whether black is to move after the moves
+            Returns: What evaluate gives after each move
+        """
+        changes = np.array(changes, dtype=np.intp).reshape(-1, 4, 2)
+        rows = _SIGNED_ROWS[:, _FEATURE_SIGNS, changes[:, :, 0], changes[:, :, 1]]
+        # int16 wraps the same way the incremental updates do, so the order of the sums makes no difference
+        values = accumulator.values[:, None, :] + self.signed_weights[rows].sum(axis=2, dtype=np.int16)
+        # The ufuncs in place, clip's argument checks cost more than the clipping at these sizes
+        hidden = np.minimum(np.maximum(values, 0, out=values), ACTIVATION_MAX, out=values)
+        # The side to move's half reads the first half of the output weights
+        us, them = (hidden[1], hidden[0]) if is_black else (hidden[0], hidden[1])
+        size = self.hidden_size
+        output = us @ self.output_weights[:size] + them @ self.output_weights[size:]
+        sign = -1 if is_black else 1
+        return [sign * ((value + self.output_bias) * SCORE_SCALE // (ACTIVATION_MAX * OUTPUT_WEIGHT_SCALE)) for value in output.tolist()]
+
+class Accumulator:
+    """
+        First layer output of both perspectives, int16[2, hidden_size] indexed [perspective]
+        Boards keep it up to date by adding and subtracting the feature weight rows of the pieces they move
+    """
+    def __init__(self, network: Network, piece_codes: List[int]):
+        """
+            Input: piece_codes: See BaseChessBoard.piece_codes
+        """
+        self.network = network
+        self.values = np.empty((2, network.hidden_size), dtype=np.int16)
+        for perspective in range(2):
+            features = [FEATURES[perspective][code - 1][square] for square, code in enumerate(piece_codes) if code]
+            self.values[perspective] = network.feature_bias + network.feature_weights[features].sum(axis=0, dtype=np.int16)
+    def add(self, piece: int, square: int) -> None:
+        """
+            Input: piece: color * 6 + piece_type
+        """
+        weights = self.network.feature_weights
+        self.values[0] += weights[FEATURES[0][piece][square]]
+        self.values[1] += weights[FEATURES[1][piece][square]]
+    def remove(self, piece: int, square: int) -> None:
+        weights = self.network.feature_weights
+        self.values[0] -= weights[FEATURES[0][piece][square]]
+        self.values[1] -= weights[FEATURES[1][piece][square]]
+
+def load_network(path: str = DEFAULT_WEIGHTS) -> Network | None:
+    """
+        Returns: The network in the weights file, None if there is no such file
+    """
+    if not os.path.exists(path):
+        return None
+    return Network.load(path)
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+# A packed move is a 16 bit int: start square index | end square index << 6 | special << 12
+# special is NORMAL, ENPASSANT, a castle, or PROMOTION + piece_type - 1 for knight, bishop, rook and queen promotions
+# Captures are not marked, they are read from the board
+NORMAL = 0
+ENPASSANT = 1
+KINGSIDE_CASTLE = 2
+QUEENSIDE_CASTLE = 3
+PROMOTION = 4
+
+def pack_move(start: int, end: int, special: int = NORMAL) -> int:
+    return start | (end << 6) | (special << 12)
+
+def move_start(move: int) -> int:
+    return move & 0x3F
+
+def move_end(move: int) -> int:
+    return (move >> 6) & 0x3F
+
+def move_special(move: int) -> int:
+    return move >> 12
+
+def promotion_type(move: int) -> int:
+    """
+        Returns: piece_type the pawn promotes to, 0 if the move is not a promotion
+    """
+    special = move >> 12
+    if special < PROMOTION:
+        return 0
+    return special - PROMOTION + 1
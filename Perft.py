@@ -0,0 +1,120 @@
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+from array import array
+from typing import List
+from ChessRules import BaseChessBoard, ChessBoard
+from Bitboards import BitboardChessBoard
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+SUITE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PerftSuite.txt")
+BACKENDS = {"chessboard": ChessBoard, "bitboard": BitboardChessBoard}
+
+def perft(board: BaseChessBoard, depth: int, buffers: List[array] | None = None) -> int:
+    """
+        Input: buffers: One packed move buffer per remaining depth, made on the first call
+        Returns: The number of leaf positions depth half moves from board
+    """
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return board.legal_move_count()
+    if buffers == None:
+        buffers = [array('H') for remaining in range(depth + 1)]
+    moves = board.generate_moves(buffers[depth])
+    nodes = 0
+    for move in moves:
+        board.push(move)
+        nodes += perft(board, depth - 1, buffers)
+        board.pop()
+    return nodes
+
+def divide(board: BaseChessBoard, depth: int) -> List[tuple[str, int]]:
+    """
+        Returns: The perft node count below each root move
+    """
+    counts = []
+    for move in board.generate_moves(array('H')):
+        name = board.to_move(move).to_long_move()
+        board.push(move)
+        counts.append((name, perft(board, depth - 1)))
+        board.pop()
+    return counts
+
+def load_suite(filename: str = SUITE_FILE) -> List[tuple[str, dict[int, int]]]:
+    """
+        Reads lines of the form "<fen> ;D1 20 ;D2 400"
+        Returns: (fen, {depth: expected nodes}) for every line
+    """
+    suite = []
+    with open(filename, "rt") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split(";")
+            expected = {}
+            for field in fields[1:]:
+                depth, nodes = field.split()
+                expected[int(depth[1:])] = int(nodes)
+            suite.append((fields[0].strip(), expected))
+    return suite
+
+def run_suite(backend: type, max_depth: int, filename: str = SUITE_FILE) -> bool:
+    total_nodes = 0
+    total_time = 0.0
+    passed = True
+    for fen, expected in load_suite(filename):
+        for depth in sorted(expected):
+            if depth > max_depth:
+                break
+            board = backend.from_fen(fen)
+            start = time.perf_counter()
+            nodes = perft(board, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            result = "ok" if nodes == expected[depth] else f"FAIL expected {expected[depth]}"
+            if nodes != expected[depth]:
+                passed = False
+            print(f"{fen} depth {depth}: {nodes} nodes {elapsed:.2f}s {result}")
+    print(f"{total_nodes} nodes in {total_time:.2f}s, {total_nodes / max(total_time, 1e-9):.0f} nodes/second")
+    return passed
+
+def main(arguments: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Count move generation leaf nodes (perft) for a position")
+    parser.add_argument("fen", nargs="?", default="startpos", help="FEN of the position, or startpos")
+    parser.add_argument("depth", nargs="?", type=int, default=3, help="Number of half moves to search")
+    parser.add_argument("--depth", dest="depth_option", type=int, metavar="DEPTH", help="Same as the depth argument, for use with --suite")
+    parser.add_argument("--backend", choices=BACKENDS.keys(), default="chessboard")
+    parser.add_argument("--divide", action="store_true", help="Print the node count below each root move")
+    parser.add_argument("--suite", action="store_true", help="Run the reference perft positions up to depth instead")
+    parser.add_argument("--suite-file", default=SUITE_FILE, metavar="FILE", help="Reference positions for --suite")
+    arguments = parser.parse_args(arguments)
+    backend = BACKENDS[arguments.backend]
+    depth = arguments.depth_option if arguments.depth_option != None else arguments.depth
+
+    if arguments.suite:
+        if arguments.fen != "startpos":
+            parser.error(f"--suite runs the positions in its file, not {arguments.fen}; give the depth with --depth")
+        return 0 if run_suite(backend, depth, arguments.suite_file) else 1
+
+    board = backend.from_fen(STARTING_FEN if arguments.fen == "startpos" else arguments.fen)
+    start = time.perf_counter()
+    if arguments.divide:
+        counts = divide(board, depth)
+        for move, nodes in counts:
+            print(f"{move}: {nodes}")
+        nodes = sum(nodes for _, nodes in counts)
+    else:
+        nodes = perft(board, depth)
+    elapsed = time.perf_counter() - start
+    print(f"Nodes: {nodes}")
+    print(f"Time: {elapsed:.2f}s")
+    print(f"Nodes/second: {nodes / max(elapsed, 1e-9):.0f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
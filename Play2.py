@@ -61,6 +61,9 @@ fen = "3b4/3r4/1n1p4/pr1kn3/p5p1/q7/b4K2/3q4 w - - 1 85"
 chess_board = ChessBoard.from_fen(fen)
 stockfish.set_fen_position(fen)
 
+# Seconds our engine may think per move
+engine_think_time = 10
+
 size_of_squares = 45
 
 dark_square = Surface((size_of_squares, size_of_squares))
@@ -141,8 +144,11 @@ def make_move(move):
         draw()
         
         #result = engine.play(board, chess.engine.Limit(time = 10))
-        move, chess_board = chess_board.make_best_move_half_depth()
-        stockfish.make_moves_from_current_position([move.to_long_move()])
+        result = chess_board.make_best_move_in_time(engine_think_time)
+        # The game is already over when result is the winner instead of a move
+        if isinstance(result, tuple):
+            move, chess_board = result
+            stockfish.make_moves_from_current_position([move.to_long_move()])
         #board.push(chess.Move(chess.Square()))
         #chess_board.make_move(result.move.uci())
         piece_selected = None
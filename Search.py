@@ -0,0 +1,473 @@
+from __future__ import annotations
+import random
+import time
+from array import array
+from multiprocessing import Event, Process, Queue
+from typing import TYPE_CHECKING, List
+from TranspositionTable import TranspositionTable, SharedTranspositionTable, EXACT, LOWER, UPPER
+from MoveOrdering import MoveOrderer, mvv_lva
+from EvaluationCache import EvaluationCache
+from PackedMove import ENPASSANT, move_end, move_special, promotion_type
+if TYPE_CHECKING:
+    from multiprocessing.pool import Pool
+    from multiprocessing.synchronize import Event as EventType
+    from ChessRules import BaseChessBoard, Move
+
+MATE_SCORE = 100000
+INFINITY = 1000000
+MAX_DEPTH = 64
+# How many nodes go by between looks at the clock
+CHECK_INTERVAL = 256
+# Centipawn values by piece_type, pawn knight bishop rook queen king
+PIECE_VALUES = [100, 300, 300, 500, 900, 0]
+# A capture that cannot bring the score within this many centipawns of alpha is not searched
+DELTA_MARGIN = 200
+# Fewer siblings than this left to search are quicker to evaluate one at a time than in one batch
+MIN_BATCH = 4
+
+class SearchTimeout(Exception):
+    """
+        Raised inside the search when the time or node budget runs out
+    """
+
+class SearchResult:
+    def __init__(self, best_move: Move | None, score: int, depth: int, pv: List[Move], nodes: int, elapsed: float):
+        self.best_move = best_move
+        self.score = score
+        self.depth = depth
+        self.pv = pv
+        self.nodes = nodes
+        self.elapsed = elapsed
+    def __str__(self):
+        return f"depth {self.depth} score {self.score} nodes {self.nodes} time {self.elapsed:.2f}s pv {' '.join(move.to_long_move() for move in self.pv)}"
+
+def score_to_table(score: int, ply: int) -> int:
+    """
+        Returns: The score with mates counted from this position instead of from the root, as the table stores them
+    """
+    if score >= MATE_SCORE - MAX_DEPTH:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_DEPTH:
+        return score - ply
+    return score
+
+def score_from_table(score: int, ply: int) -> int:
+    if score >= MATE_SCORE - MAX_DEPTH:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_DEPTH:
+        return score + ply
+    return score
+
+def capture_gain(board: BaseChessBoard, move: int) -> int:
+    """
+        Returns: Centipawns of material the packed move wins, counting the captured piece and any promotion
+    """
+    gain = 0
+    promotion = promotion_type(move)
+    if promotion:
+        gain = PIECE_VALUES[promotion] - PIECE_VALUES[0]
+    if move_special(move) == ENPASSANT:
+        return gain + PIECE_VALUES[0]
+    return gain + PIECE_VALUES[max(board.piece_type_at(move_end(move)), 0)]
+
+def pv_moves(board: BaseChessBoard, pv: List[int]) -> List[Move]:
+    """
+        Returns: The packed principal variation as Moves, each read from the position it is played in
+    """
+    moves = []
+    for move in pv:
+        moves.append(board.to_move(move))
+        board.push(move)
+    for move in pv:
+        board.pop()
+    return moves
+
+def evaluate(board: BaseChessBoard, ply: int, cache: EvaluationCache | None = None, static_eval: int | None = None) -> int:
+    """
+        Input: cache: Looked up before evaluating, None always evaluates
+            static_eval: board.static_eval() when the caller already has it, see BaseChessBoard.child_static_evals
+        Returns: The static eval in centipawns from the point of view of the side to move, the mate score when it is checkmated
+    """
+    if board.check_check() and not board.has_legal_move():
+        # Only the side to move can be the one checkmated
+        return -MATE_SCORE + ply
+    if static_eval != None:
+        score = static_eval
+        if cache != None:
+            cache.store(board.zobrist_key, score)
+    else:
+        score = board.static_eval() if cache == None else cache.evaluate(board)
+    if board.color_to_move.is_black:
+        return -score
+    return score
+
+class Searcher:
+    """
+        Negamax alpha-beta search over any BaseChessBoard using push/pop
+        Moves are packed ints generated into one reused buffer per ply, Moves are only made for the results
+        fail_soft: Return the best score found even when it falls outside the window, otherwise clamp to alpha/beta
+        random_tie_break: Search root moves so that equal best scores are exact and pick one of them at random
+        transposition_table: Table shared with other searches, a new 16 MB table if None
+        quiescence: Resolve captures and promotions at the leaves before evaluating
+        move_orderer: Killer and history tables shared with other searches, new empty tables if None
+        evaluation_cache: Static evaluations shared with other searches, a new 4 MB cache if None
+        batch_leaves: Score the stand pats of sibling quiescence nodes in one network call, see sibling_evals, only with a network loaded
+            as the hand-written evaluation is already updated move by move
+    """
+    def __init__(self, fail_soft: bool = True, random_tie_break: bool = True, transposition_table: TranspositionTable | None = None, quiescence: bool = True, move_orderer: MoveOrderer | None = None, evaluation_cache: EvaluationCache | None = None, batch_leaves: bool = False):
+        self.fail_soft = fail_soft
+        self.random_tie_break = random_tie_break
+        self.quiescence = quiescence
+        self.batch_leaves = batch_leaves
+        self.transposition_table = transposition_table if transposition_table != None else TranspositionTable()
+        self.move_orderer = move_orderer if move_orderer != None else MoveOrderer()
+        self.evaluation_cache = evaluation_cache if evaluation_cache != None else EvaluationCache()
+        self.nodes = 0
+        self.deadline: float | None = None
+        self.node_limit: int | None = None
+        # Set by another process to end the search early
+        self.stop_event: EventType | None = None
+        self.pv_table: List[List[int]] = [[] for ply in range(MAX_DEPTH + 1)]
+        self.root_pvs: dict[int, List[int]] = {}
+        self.move_buffers: List[array] = [array('H') for ply in range(MAX_DEPTH + 1)]
+    def check_budget(self) -> None:
+        if self.node_limit != None and self.nodes >= self.node_limit:
+            raise SearchTimeout()
+        if self.deadline != None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+        if self.stop_event != None and self.stop_event.is_set():
+            raise SearchTimeout()
+    def negamax(self, board: BaseChessBoard, depth: int, alpha: int, beta: int, ply: int = 0) -> int:
+        if depth <= 0 and self.quiescence:
+            return self.quiesce(board, alpha, beta, ply)
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_budget()
+        self.pv_table[ply] = []
+        if depth <= 0 or ply >= MAX_DEPTH:
+            return evaluate(board, ply, self.evaluation_cache)
+        key = board.zobrist_key
+        hash_move = 0
+        entry = self.transposition_table.probe(key)
+        if entry != None:
+            hash_move, bound, entry_depth, score = entry
+            if entry_depth >= depth:
+                score = score_from_table(score, ply)
+                if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                    if self.fail_soft:
+                        return score
+                    return min(max(score, alpha), beta)
+        moves = board.generate_moves(self.move_buffers[ply])
+        if not moves:
+            if board.check_check():
+                return -MATE_SCORE + ply
+            return 0
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = 0
+        moves = self.move_orderer.order(board, moves, ply, hash_move)
+        static_evals = [None]
+        for index, move in enumerate(moves):
+            if depth == 1 and self.quiescence and index == len(static_evals):
+                static_evals += self.sibling_evals(board, moves, index)
+            board.push(move)
+            if depth == 1 and self.quiescence:
+                score = -self.quiesce(board, -beta, -alpha, ply + 1, static_evals[index])
+            else:
+                score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    best_move = move
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                    if score >= beta:
+                        self.move_orderer.record_cutoff(board, move, ply, depth)
+                        break
+        if best_score >= beta:
+            bound = LOWER
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.transposition_table.store(key, depth, score_to_table(best_score, ply), bound, best_move)
+        if self.fail_soft:
+            return best_score
+        return min(alpha, beta)
+    def quiesce(self, board: BaseChessBoard, alpha: int, beta: int, ply: int, static_eval: int | None = None) -> int:
+        """
+            Searches only captures and promotions until the position is quiet
+            The side to move may always stand pat on the static eval instead of capturing
+            Input: static_eval: board.static_eval() when the parent scored it with sibling_evals
+        """
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_budget()
+        self.pv_table[ply] = []
+        stand_pat = evaluate(board, ply, self.evaluation_cache, static_eval)
+        if ply >= MAX_DEPTH or stand_pat <= -MATE_SCORE + MAX_DEPTH:
+            return stand_pat
+        best_score = stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+            if stand_pat >= beta:
+                return stand_pat if self.fail_soft else beta
+        captures = []
+        for move in board.generate_captures(self.move_buffers[ply]):
+            gain = capture_gain(board, move)
+            if stand_pat + gain + DELTA_MARGIN > alpha:
+                captures.append((mvv_lva(board, move), move))
+        captures.sort(key=lambda capture: capture[0], reverse=True)
+        moves = [move for _, move in captures]
+        static_evals = [None]
+        for index, move in enumerate(moves):
+            if index == len(static_evals):
+                static_evals += self.sibling_evals(board, moves, index)
+            board.push(move)
+            score = -self.quiesce(board, -beta, -alpha, ply + 1, static_evals[index])
+            board.pop()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                    if score >= beta:
+                        break
+        if self.fail_soft:
+            return best_score
+        return min(alpha, beta)
+    def sibling_evals(self, board: BaseChessBoard, moves: List[int], start: int) -> List[int | None]:
+        """
+            Called when moves[start] is about to be searched, the moves before it having given no cutoff
+            The run of moves scored together is as long as all the moves before it, so a cutoff wastes at most about half the scores
+            Returns: The static eval after each move of the run, None for moves the child quiescence search evaluates itself
+        """
+        if not self.batch_leaves:
+            return [None] * (len(moves) - start)
+        run = moves[start:start + max(start, MIN_BATCH)]
+        if len(run) >= MIN_BATCH:
+            static_evals = board.child_static_evals(run)
+            if static_evals != None:
+                return static_evals
+        return [None] * len(run)
+    def root_moves(self, board: BaseChessBoard) -> List[int]:
+        """
+            Returns: The packed legal moves of the root position, ordered
+        """
+        moves = board.generate_moves(self.move_buffers[0])
+        entry = self.transposition_table.probe(board.zobrist_key)
+        return self.move_orderer.order(board, moves, 0, entry[0] if entry != None else 0)
+    def search(self, board: BaseChessBoard, depth: int, moves: List[int] | None = None) -> tuple[List[int], int]:
+        """
+            Input: Packed root moves to search in order, all legal moves if None
+            Returns: The best packed root moves (every tied move with random_tie_break) and their score, no moves if the game is over
+        """
+        depth = max(depth, 1)
+        self.nodes += 1
+        self.root_pvs = {}
+        if moves == None:
+            moves = self.root_moves(board)
+        if not moves:
+            if board.check_check():
+                return [], -MATE_SCORE
+            return [], 0
+        best_moves = []
+        best_score = -INFINITY
+        alpha = -INFINITY
+        static_evals = [None]
+        for index, move in enumerate(moves):
+            if depth == 1 and self.quiescence and index == len(static_evals):
+                static_evals += self.sibling_evals(board, moves, index)
+            board.push(move)
+            if depth == 1 and self.quiescence:
+                score = -self.quiesce(board, -INFINITY, -alpha, 1, static_evals[index])
+            else:
+                score = -self.negamax(board, depth - 1, -INFINITY, -alpha, 1)
+            board.pop()
+            if score > best_score:
+                best_score = score
+                best_moves = [move]
+            elif score == best_score and self.random_tie_break:
+                best_moves.append(move)
+            if score == best_score:
+                self.root_pvs[move] = [move] + self.pv_table[1]
+            # One below the best keeps later ties exact instead of cut off
+            alpha = max(alpha, best_score - 1 if self.random_tie_break else best_score)
+        self.transposition_table.store(board.zobrist_key, depth, best_score, EXACT, best_moves[0])
+        return best_moves, best_score
+    def parallel_search(self, board: BaseChessBoard, depth: int, pool: Pool, workers: int) -> tuple[List[int], int]:
+        """
+            Like search, but the root moves after the first are split over the pool workers workers at a time
+            Each worker rebuilds the position from its FEN and the alpha bound is refreshed between batches
+        """
+        depth = max(depth, 1)
+        moves = self.root_moves(board)
+        # The likely best move is searched here so the workers start with a real bound
+        best_moves, best_score = self.search(board, depth, moves[:1])
+        if not moves:
+            return best_moves, best_score
+        alpha = best_score - 1 if self.random_tie_break else best_score
+        fen = board.fen
+        for start in range(1, len(moves), workers):
+            batch = [(type(board), fen, move, depth, alpha, self.fail_soft, self.quiescence) for move in moves[start:start + workers]]
+            for move, score, nodes in pool.starmap(search_root_move, batch):
+                self.nodes += nodes
+                if score > best_score:
+                    best_score = score
+                    best_moves = [move]
+                elif score == best_score and self.random_tie_break:
+                    best_moves.append(move)
+                if score == best_score:
+                    self.root_pvs[move] = [move]
+            alpha = max(alpha, best_score - 1 if self.random_tie_break else best_score)
+        self.transposition_table.store(board.zobrist_key, depth, best_score, EXACT, best_moves[0])
+        return best_moves, best_score
+    def best_move(self, board: BaseChessBoard, depth: int, pool: Pool | None = None, workers: int = 1) -> Move | None:
+        """
+            Input: pool: Worker processes to split the root moves over, the search stays in this process if None
+        """
+        self.transposition_table.new_search()
+        self.move_orderer.new_search()
+        if pool != None:
+            best_moves, _ = self.parallel_search(board, depth, pool, workers)
+        else:
+            best_moves, _ = self.search(board, depth)
+        if not best_moves:
+            return None
+        if self.random_tie_break:
+            return board.to_move(random.choice(best_moves))
+        return board.to_move(best_moves[0])
+    def iterative_deepening(self, board: BaseChessBoard, max_depth: int = MAX_DEPTH, time_limit: float | None = None, node_limit: int | None = None, depth_offset: int = 0) -> SearchResult:
+        """
+            Searches depth 1, 2, 3... until max_depth or until time_limit seconds or node_limit nodes run out
+            depth_offset: Start that many half moves deeper, so 1 searches 2, 3, 4...
+            Returns: The best move and principal variation of the last depth that finished, the first depth always finishes
+        """
+        start = time.perf_counter()
+        self.nodes = 0
+        self.deadline = None
+        self.node_limit = None
+        stack_size = len(board.move_stack)
+        self.transposition_table.new_search()
+        self.move_orderer.new_search()
+        moves = self.root_moves(board)
+        result = SearchResult(None, 0, 0, [], 0, 0.0)
+        if not moves:
+            result.score = -MATE_SCORE if board.check_check() else 0
+            return result
+        max_depth = max(max_depth, 1)
+        first_depth = min(1 + depth_offset, max_depth)
+        for depth in range(first_depth, max_depth + 1):
+            try:
+                best_moves, score = self.search(board, depth, moves)
+            except SearchTimeout:
+                # Unwind whatever the interrupted iteration left on the board
+                while len(board.move_stack) > stack_size:
+                    board.pop()
+                break
+            best_move = random.choice(best_moves) if self.random_tie_break else best_moves[0]
+            pv = pv_moves(board, self.root_pvs[best_move])
+            result = SearchResult(pv[0], score, depth, pv, self.nodes, time.perf_counter() - start)
+            # Search the best move first next time, it is the most likely to stay best
+            moves = [best_move] + [move for move in moves if move != best_move]
+            if abs(score) >= MATE_SCORE - MAX_DEPTH:
+                break
+            if depth == first_depth:
+                self.deadline = start + time_limit if time_limit != None else None
+                self.node_limit = node_limit
+                if time_limit != None and time.perf_counter() >= self.deadline:
+                    break
+        self.deadline = None
+        self.node_limit = None
+        result.nodes = self.nodes
+        result.elapsed = time.perf_counter() - start
+        return result
+    def lazy_smp(self, board: BaseChessBoard, helpers: LazySmpHelpers, max_depth: int = MAX_DEPTH, time_limit: float | None = None, node_limit: int | None = None) -> SearchResult:
+        """
+            Lazy SMP: the helper processes run iterative_deepening on the same position alongside this one
+            They only share the transposition table, each helper searches one or two half moves deeper than this process
+            at every iteration, so they fill the table ahead of it instead of repeating its searches
+            The transposition_table must be the helpers' SharedTranspositionTable
+            Returns: The result of the search in this process, the helpers are stopped once it finishes
+        """
+        helpers.start(board, max_depth, time_limit)
+        try:
+            return self.iterative_deepening(board, max_depth, time_limit, node_limit)
+        finally:
+            helpers.stop()
+
+class LazySmpHelpers:
+    """
+        Helper processes for Searcher.lazy_smp kept from one search to the next, so the shared table and the helpers'
+        own move ordering tables carry over between moves
+        Each helper waits for a position, searches it into the table until stopped, then waits for the next one
+    """
+    def __init__(self, transposition_table: SharedTranspositionTable, count: int):
+        self.transposition_table = transposition_table
+        self.stop_event = Event()
+        # One queue per helper so each gets its own depth offset, and one for the helpers to report they stopped
+        self.jobs = [Queue() for helper in range(count)]
+        self.done = Queue()
+        self.processes = [Process(target=lazy_smp_helper, args=(transposition_table, jobs, self.stop_event, self.done), daemon=True) for jobs in self.jobs]
+        for process in self.processes:
+            process.start()
+    def __len__(self) -> int:
+        return len(self.processes)
+    def start(self, board: BaseChessBoard, max_depth: int, time_limit: float | None) -> None:
+        self.stop_event.clear()
+        fen = board.fen
+        for helper, jobs in enumerate(self.jobs):
+            # The helpers age their view of the table from the same generation as this process
+            jobs.put((type(board), fen, max_depth, time_limit, 1 + helper % 2, self.transposition_table.generation))
+    def stop(self) -> None:
+        """
+            Returns once every helper has stopped searching
+        """
+        self.stop_event.set()
+        for jobs in self.jobs:
+            self.done.get()
+    def close(self) -> None:
+        for jobs in self.jobs:
+            jobs.put(None)
+        for process in self.processes:
+            process.join()
+
+# Each pool worker keeps one Searcher for the life of its process so its tables carry over between root moves
+_worker_searcher: Searcher | None = None
+
+def search_root_move(backend: type, fen: str, move: int, depth: int, alpha: int, fail_soft: bool, quiescence: bool) -> tuple[int, int, int]:
+    """
+        Runs in a pool worker, searches a single root move of the position
+        Returns: The move, its score from the root side's point of view and the nodes searched
+    """
+    global _worker_searcher
+    if _worker_searcher == None:
+        _worker_searcher = Searcher()
+    searcher = _worker_searcher
+    searcher.fail_soft = fail_soft
+    searcher.quiescence = quiescence
+    searcher.nodes = 0
+    board = backend.from_fen(fen)
+    board.push(move)
+    score = -searcher.negamax(board, depth - 1, -INFINITY, -alpha, 1)
+    return move, score, searcher.nodes
+
+def lazy_smp_helper(transposition_table: SharedTranspositionTable, jobs: Queue, stop_event: EventType, done: Queue) -> None:
+    """
+        Runs in a Lazy SMP helper process until it is sent None, its only output is what it stores in the shared table
+    """
+    searcher = Searcher(transposition_table=transposition_table)
+    searcher.stop_event = stop_event
+    try:
+        while True:
+            job = jobs.get()
+            if job == None:
+                return
+            backend, fen, max_depth, time_limit, depth_offset, transposition_table.generation = job
+            try:
+                searcher.iterative_deepening(backend.from_fen(fen), max_depth, time_limit, depth_offset=depth_offset)
+            finally:
+                done.put(None)
+    finally:
+        transposition_table.close()
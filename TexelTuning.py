@@ -0,0 +1,213 @@
+from __future__ import annotations
+import argparse
+import json
+import math
+import re
+import sys
+import time
+from multiprocessing import Pool, cpu_count
+from typing import List
+import numpy as np
+from Bitboards import BitboardChessBoard, NO_PIECE
+from Evaluation import WEIGHTS_FILE, MAX_PHASE, MIDDLEGAME_VALUES, ENDGAME_VALUES, MIDDLEGAME_PST, ENDGAME_PST, DOUBLED_PAWN, ISOLATED_PAWN, BACKWARD_PAWN, PASSED_PAWN, pawn_counts
+
+# static_eval is linear in its weights once the phase is known: each weight is multiplied by how many more
+# white than black pieces or pawn patterns it applies to. The feature vector holds those counts in this order
+VALUE_OFFSET = 0
+PST_OFFSET = VALUE_OFFSET + 6
+PAWN_OFFSET = PST_OFFSET + 6 * 64
+FEATURE_COUNT = PAWN_OFFSET + 3 + 8
+# Indexed [piece_type][table square], the squares a piece can stand on in the rank 8 first table layout: pawns never reach the first or last rank
+TABLE_SQUARES = np.array([[piece_type != 0 or 8 <= square < 56 for square in range(64)] for piece_type in range(6)])
+# Game results from white's side at the end of an EPD line, numbers must be quoted or bracketed to tell them from the move counters
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+RESULT_PATTERN = re.compile(r'(?:[\["]?(1-0|0-1|1/2-1/2)[\]"]?|[\["](\d*\.?\d+)[\]"]);?\s*$')
+
+def position_features(fen: str) -> tuple[List[int], int]:
+    """
+        Returns: The feature counts of the position and its game phase
+    """
+    board = BitboardChessBoard.from_fen(fen)
+    features = [0] * FEATURE_COUNT
+    for square, piece in enumerate(board.mailbox):
+        if piece == NO_PIECE:
+            continue
+        color, piece_type = divmod(piece, 6)
+        sign = -1 if color else 1
+        features[VALUE_OFFSET + piece_type] += sign
+        # The piece-square tables are written rank 8 first from white's side, see Evaluation._piece_tables
+        features[PST_OFFSET + piece_type * 64 + (square if color else square ^ 56)] += sign
+    counts, _, _ = pawn_counts(*board.pawn_bitboards())
+    features[PAWN_OFFSET:] = counts
+    return features, min(board.phase, MAX_PHASE)
+
+def extract_features(fens: List[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Returns: float32[len(fens), FEATURE_COUNT] features and float32[len(fens)] phases
+    """
+    rows = [position_features(fen) for fen in fens]
+    return np.array([row[0] for row in rows], dtype=np.float32).reshape(-1, FEATURE_COUNT), np.array([row[1] for row in rows], dtype=np.float32)
+
+def load_positions(path: str) -> tuple[List[str], np.ndarray]:
+    """
+        Input: path: One position per line, a FEN followed by the game result as 1-0, 0-1, 1/2-1/2 or a number from 0 to 1,
+            optionally quoted or bracketed like c9 "1-0"; or [0.5]
+        Returns: The FENs and the results from white's side
+    """
+    fens = []
+    results = []
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            match = RESULT_PATTERN.search(line)
+            if not line or match == None:
+                continue
+            fields = line.split()
+            if len(fields) < 4:
+                continue
+            fens.append(" ".join(fields[:4]))
+            results.append(RESULTS[match.group(1)] if match.group(1) != None else float(match.group(2)))
+    return fens, np.array(results, dtype=np.float32)
+
+def current_weights() -> tuple[np.ndarray, np.ndarray]:
+    """
+        Returns: The middlegame and the endgame weights static_eval uses now, laid out like the features
+    """
+    weights = []
+    for values, pst, phase in ((MIDDLEGAME_VALUES, MIDDLEGAME_PST, 0), (ENDGAME_VALUES, ENDGAME_PST, 1)):
+        pawn_terms = [DOUBLED_PAWN[phase], ISOLATED_PAWN[phase], BACKWARD_PAWN[phase]] + [term[phase] for term in PASSED_PAWN]
+        weights.append(np.array(list(values) + [bonus for table in pst for bonus in table] + pawn_terms, dtype=np.float64))
+    return weights[0], weights[1]
+
+def center_tables(weights: np.ndarray) -> None:
+    """
+        Moves the mean of each piece-square table over the squares its piece can stand on into the piece's value, in place
+        A value feature is the sum of its table's features, so without this the two drift together and split the material arbitrarily
+        Input: weights: Middlegame or endgame weights laid out like the features
+    """
+    for piece_type in range(6):
+        table = weights[PST_OFFSET + piece_type * 64:PST_OFFSET + piece_type * 64 + 64]
+        mean = table[TABLE_SQUARES[piece_type]].mean()
+        table[TABLE_SQUARES[piece_type]] -= mean
+        weights[VALUE_OFFSET + piece_type] += mean
+
+def piece_values(weights: np.ndarray) -> np.ndarray:
+    """
+        Returns: Average worth of each piece_type, its value plus the mean of its table
+    """
+    tables = weights[PST_OFFSET:PAWN_OFFSET].reshape(6, 64)
+    return weights[VALUE_OFFSET:PST_OFFSET] + np.array([tables[piece_type][TABLE_SQUARES[piece_type]].mean() for piece_type in range(6)])
+
+def predict(features: np.ndarray, phases: np.ndarray, middlegame: np.ndarray, endgame: np.ndarray) -> np.ndarray:
+    """
+        Returns: static_eval of every position, before rounding
+    """
+    return (features @ middlegame * phases + features @ endgame * (MAX_PHASE - phases)) / MAX_PHASE
+
+def win_probability(scores: np.ndarray, k: float) -> np.ndarray:
+    return 1 / (1 + np.power(10, -k * scores / 400))
+
+def mean_error(scores: np.ndarray, results: np.ndarray, k: float) -> float:
+    return float(np.mean((results - win_probability(scores, k)) ** 2))
+
+def fit_k(scores: np.ndarray, results: np.ndarray) -> float:
+    """
+        Returns: The sigmoid scale that best maps the current scores to results, found by golden section search
+    """
+    low, high = 0.1, 4.0
+    ratio = (math.sqrt(5) - 1) / 2
+    for step in range(40):
+        left = high - ratio * (high - low)
+        right = low + ratio * (high - low)
+        if mean_error(scores, results, left) < mean_error(scores, results, right):
+            high = right
+        else:
+            low = left
+    return (low + high) / 2
+
+def tune(features: np.ndarray, phases: np.ndarray, results: np.ndarray, k: float, middlegame: np.ndarray, endgame: np.ndarray, iterations: int = 1000, learning_rate: float = 1.0) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Minimises the mean squared error between results and win_probability of the scores with Adam,
+        every step uses the exact gradient over all positions
+        Returns: The fitted middlegame and endgame weights
+    """
+    weights = np.concatenate((middlegame, endgame))
+    center_tables(weights[:FEATURE_COUNT])
+    center_tables(weights[FEATURE_COUNT:])
+    first_moment = np.zeros_like(weights)
+    second_moment = np.zeros_like(weights)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    scale = k * math.log(10) / 400
+    middlegame_share = phases / MAX_PHASE
+    for step in range(1, iterations + 1):
+        probability = win_probability(predict(features, phases, weights[:FEATURE_COUNT], weights[FEATURE_COUNT:]), k)
+        error = ((probability - results) * probability * (1 - probability)).astype(np.float32) * np.float32(2 * scale / len(results))
+        # Each weight's gradient is its feature scaled by how much of the score its half makes up at that phase
+        gradient = np.concatenate((features.T @ (error * middlegame_share), features.T @ (error * (1 - middlegame_share))))
+        first_moment = beta1 * first_moment + (1 - beta1) * gradient
+        second_moment = beta2 * second_moment + (1 - beta2) * gradient * gradient
+        weights -= learning_rate * (first_moment / (1 - beta1 ** step)) / (np.sqrt(second_moment / (1 - beta2 ** step)) + epsilon)
+        center_tables(weights[:FEATURE_COUNT])
+        center_tables(weights[FEATURE_COUNT:])
+        if step % 100 == 0 or step == iterations:
+            print(f"step {step}: error {mean_error(predict(features, phases, weights[:FEATURE_COUNT], weights[FEATURE_COUNT:]), results, k):.6f}")
+    return weights[:FEATURE_COUNT], weights[FEATURE_COUNT:]
+
+def weights_to_json(middlegame: np.ndarray, endgame: np.ndarray) -> dict:
+    """
+        Returns: The weights rounded to whole centipawns under the names Evaluation reads them by
+    """
+    worth = (piece_values(middlegame) + piece_values(endgame)) / 2
+    if worth[0] <= 0:
+        raise ValueError(f"Tuned pawn value {worth[0]:.1f} is not positive, the positions do not say enough about material")
+    points = [int(round(worth[piece_type] / worth[0])) for piece_type in range(5)] + [0]
+    middlegame = [int(round(weight)) for weight in middlegame]
+    endgame = [int(round(weight)) for weight in endgame]
+    # Kings are never traded, their value is only ever a constant
+    middlegame[VALUE_OFFSET + 5] = endgame[VALUE_OFFSET + 5] = 0
+    pawn_terms = list(zip(middlegame[PAWN_OFFSET:], endgame[PAWN_OFFSET:]))
+    return {
+        "points": points,
+        "middlegame_values": middlegame[VALUE_OFFSET:PST_OFFSET],
+        "endgame_values": endgame[VALUE_OFFSET:PST_OFFSET],
+        "middlegame_pst": [middlegame[PST_OFFSET + piece_type * 64:PST_OFFSET + piece_type * 64 + 64] for piece_type in range(6)],
+        "endgame_pst": [endgame[PST_OFFSET + piece_type * 64:PST_OFFSET + piece_type * 64 + 64] for piece_type in range(6)],
+        "doubled_pawn": pawn_terms[0],
+        "isolated_pawn": pawn_terms[1],
+        "backward_pawn": pawn_terms[2],
+        "passed_pawn": pawn_terms[3:]
+    }
+
+def main(arguments: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Fit the evaluation weights to game results (Texel tuning)")
+    parser.add_argument("positions", help="EPD file of positions, each followed by the result of its game")
+    parser.add_argument("--output", default=WEIGHTS_FILE, help="Weights file to write, the engine loads the default one at startup")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--learning-rate", type=float, default=1.0, help="Adam step size in centipawns")
+    parser.add_argument("--workers", type=int, default=cpu_count(), help="Processes extracting features")
+    arguments = parser.parse_args(arguments)
+
+    start = time.perf_counter()
+    fens, results = load_positions(arguments.positions)
+    if not fens:
+        print(f"No positions with results in {arguments.positions}")
+        return 1
+    chunk_size = max(len(fens) // (arguments.workers * 4), 1)
+    chunks = [fens[index:index + chunk_size] for index in range(0, len(fens), chunk_size)]
+    with Pool(arguments.workers) as pool:
+        parts = pool.map(extract_features, chunks)
+    features = np.concatenate([part[0] for part in parts])
+    phases = np.concatenate([part[1] for part in parts])
+    print(f"{len(fens)} positions loaded in {time.perf_counter() - start:.2f}s")
+
+    middlegame, endgame = current_weights()
+    k = fit_k(predict(features, phases, middlegame, endgame), results)
+    print(f"K = {k:.4f}, error {mean_error(predict(features, phases, middlegame, endgame), results, k):.6f}")
+    middlegame, endgame = tune(features, phases, results, k, middlegame, endgame, arguments.iterations, arguments.learning_rate)
+    with open(arguments.output, "w") as file:
+        json.dump(weights_to_json(middlegame, endgame), file)
+    print(f"Weights written to {arguments.output} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
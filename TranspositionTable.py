@@ -0,0 +1,129 @@
+from __future__ import annotations
+import os
+from array import array
+from multiprocessing import shared_memory
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Each entry is two 64 bit words: the Zobrist key XOR the data word, then the data word packed as
+# move (16 bits) | bound (2 bits) << 16 | depth (8 bits) << 18 | generation (6 bits) << 26 | score + SCORE_OFFSET (32 bits) << 32
+# Storing the key XOR the data means an entry torn by two processes writing at once no longer matches its key
+ENTRY_WORDS = 2
+BUCKET_ENTRIES = 2
+BUCKET_BYTES = ENTRY_WORDS * BUCKET_ENTRIES * 8
+SCORE_OFFSET = 1 << 31
+
+def pack(move: int, bound: int, depth: int, generation: int, score: int) -> int:
+    return move | (bound << 16) | (min(max(depth, 0), 255) << 18) | (generation << 26) | ((score + SCORE_OFFSET) << 32)
+
+def unpack(data: int) -> tuple[int, int, int, int, int]:
+    """
+        Returns: move, bound, depth, generation and score packed into a data word
+    """
+    return data & 0xFFFF, (data >> 16) & 0x3, (data >> 18) & 0xFF, (data >> 26) & 0x3F, (data >> 32) - SCORE_OFFSET
+
+class TranspositionTable:
+    """
+        Fixed size hash table of search results keyed by Zobrist key
+        Every bucket holds a depth-preferred entry and an always-replace entry
+    """
+    def __init__(self, size_mb: float = 16):
+        buckets = max(int(size_mb * 1024 * 1024) // BUCKET_BYTES, 1)
+        # Round down to a power of two so the bucket index is a mask
+        self.bucket_count = 1 << (buckets.bit_length() - 1)
+        self.mask = self.bucket_count - 1
+        self.table: array | memoryview = self._allocate()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+    def _allocate(self) -> array | memoryview:
+        return array('Q', bytes(self.bucket_count * BUCKET_BYTES))
+    @property
+    def size_mb(self) -> float:
+        return self.bucket_count * BUCKET_BYTES / (1024 * 1024)
+    @property
+    def hit_rate(self) -> float:
+        if self.hits + self.misses == 0:
+            return 0.0
+        return self.hits / (self.hits + self.misses)
+    def clear(self) -> None:
+        self.table = self._allocate()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+    def new_search(self) -> None:
+        """
+            Ages every stored entry so the depth-preferred slots can be reclaimed by the coming search
+        """
+        self.generation = (self.generation + 1) & 0x3F
+    def probe(self, key: int) -> tuple[int, int, int, int] | None:
+        """
+            Returns: move, bound, depth and score stored for the key, None if it is not in the table
+        """
+        index = (key & self.mask) * BUCKET_ENTRIES * ENTRY_WORDS
+        table = self.table
+        for slot in range(index, index + BUCKET_ENTRIES * ENTRY_WORDS, ENTRY_WORDS):
+            data = table[slot + 1]
+            if data and table[slot] ^ data == key:
+                self.hits += 1
+                move, bound, depth, _, score = unpack(data)
+                return move, bound, depth, score
+        self.misses += 1
+        return None
+    def store(self, key: int, depth: int, score: int, bound: int, move: int) -> None:
+        index = (key & self.mask) * BUCKET_ENTRIES * ENTRY_WORDS
+        table = self.table
+        self.stores += 1
+        data = table[index + 1]
+        same_key = table[index] ^ data == key
+        if same_key and not move:
+            # Keep the old best move rather than forget it
+            move = data & 0xFFFF
+        if not data or same_key or depth >= (data >> 18) & 0xFF or (data >> 26) & 0x3F != self.generation:
+            slot = index
+        else:
+            slot = index + 2
+        data = pack(move, bound, depth, self.generation, score)
+        table[slot] = key ^ data
+        table[slot + 1] = data
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+        Transposition table in a multiprocessing.shared_memory block so several processes can search with it at once
+        Writes take no lock, torn entries fail the key check in probe and count as misses
+        name: Attach to the block another process created, create a new block if None
+        Pickles as its block name so it can be handed to other processes
+    """
+    def __init__(self, size_mb: float = 16, name: str | None = None):
+        self.shared_memory: shared_memory.SharedMemory | None = None
+        # Forked children inherit this object, only the creating process may free the block
+        self.owner_pid = os.getpid() if name == None else None
+        self.name = name
+        super().__init__(size_mb)
+    def _allocate(self) -> memoryview:
+        size = self.bucket_count * BUCKET_BYTES
+        if self.shared_memory == None:
+            if self.name == None:
+                # New blocks come zeroed, so every entry starts empty
+                self.shared_memory = shared_memory.SharedMemory(create=True, size=size)
+                self.name = self.shared_memory.name
+            else:
+                self.shared_memory = shared_memory.SharedMemory(name=self.name)
+        else:
+            self.table.release()
+            self.shared_memory.buf[:size] = bytes(size)
+        return self.shared_memory.buf[:size].cast('Q')
+    def __reduce__(self):
+        return SharedTranspositionTable, (self.size_mb, self.name), {"generation": self.generation}
+    def close(self) -> None:
+        """
+            Detaches from the block, the process that created it also frees it
+        """
+        self.table.release()
+        self.shared_memory.close()
+        if self.owner_pid == os.getpid():
+            self.shared_memory.unlink()
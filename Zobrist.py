@@ -0,0 +1,15 @@
+from __future__ import annotations
+import random
+from typing import List
+
+# Fixed seed so every process (and every run) agrees on the keys, ChessRules reseeds the global generator from the clock
+_random = random.Random(0x5EED_C4E55)
+
+# Indexed [color * 6 + piece_type][square index], piece types in the order pawn, knight, bishop, rook, queen, king
+PIECE_KEYS: List[List[int]] = [[_random.getrandbits(64) for square in range(64)] for piece in range(12)]
+# Indexed by castling rights bitmask, 1 = white kingside, 2 = white queenside, 4 = black kingside, 8 = black queenside
+CASTLING_KEYS: List[int] = [_random.getrandbits(64) for rights in range(16)]
+# Indexed by the file of the en passant square
+ENPASSANT_KEYS: List[int] = [_random.getrandbits(64) for file in range(8)]
+# Present when black is to move
+SIDE_KEY: int = _random.getrandbits(64)